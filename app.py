@@ -1,253 +1,119 @@
 import streamlit as st
-import zipfile
-import io
-import os
-import re
-import tempfile
+import numpy as np
 import pandas as pd
-import pdfplumber
 from datetime import datetime, timedelta
+from functools import partial
+
+from stok.config import LOCATIONS, DEFAULT_NEEDS, WEEK_MODES
+from stok.cache import TableCache, frame_fingerprint, state_fingerprint
+from stok.dataset import (
+    DATASET_AVAILABLE,
+    DATASET_ENGINE,
+    dataset_dates,
+    query_rekap,
+    stock_rows,
+    withdrawal_rows,
+    write_partitions,
+)
+from stok.export import bulk_workbook, kebutuhan_workbook, penarikan_workbook
+from stok.ingest import merge_ingested
+from stok.jobs import IngestJob
+from stok.items import ItemIndex, canonical_key, match_stock, unmatched_items
+from stok.needs import (
+    build_needs_cube,
+    location_overview,
+    needs_config_frame,
+    needs_config_from_frame,
+    needs_table,
+    penarikan_table,
+    portions_array,
+)
+from stok.plan import forecast_shortages, plan_frame, read_portion_plan
+from stok.store import StokStore
+from stok.timing import stage
+from stok.recap import (
+    build_daily_cube,
+    copy_daily_cube,
+    cube_dates,
+    cube_rekap_day,
+    cube_rekap_period,
+    cube_rekap_total,
+    cube_rekap_week,
+    cube_stock_per_location,
+    cube_weeks,
+    update_daily_cube,
+)
 
 st.set_page_config(page_title="PDF Stok Processor Enhanced", layout="wide")
 
 # -------------------------
-# CONFIG / DEFAULTS
+# PERSISTENT STORE
 # -------------------------
-LOCATIONS = ["Llagang", "Batoh", "Merduati", "Ldingin", "Cadek", "Pkn Bil", "Seutui"]
-
-# Default NEEDS_PER_PORTION with gramasi (weight/unit per portion)
-DEFAULT_NEEDS = {
-    "Asam Jawa": {"small": 0.02, "large": 0.04, "unit": "kg"},
-    "Bawang Merah": {"small": 0.05, "large": 0.1, "unit": "kg"},
-    "Bawang Putih": {"small": 0.03, "large": 0.06, "unit": "kg"},
-    "Beras": {"small": 0.1, "large": 0.2, "unit": "kg"},
-    "Bumbu Giling Putih": {"small": 0.01, "large": 0.02, "unit": "kg"},
-    "Cabe Giling Merah": {"small": 0.02, "large": 0.04, "unit": "kg"},
-    "Bumbu Giling Merah": {"small": 0.015, "large": 0.03, "unit": "kg"},
-    "Daun Pra": {"small": 0.005, "large": 0.01, "unit": "kg"},
-    "Daun Salam": {"small": 0.002, "large": 0.004, "unit": "kg"},
-    "Garam": {"small": 0.01, "large": 0.02, "unit": "kg"},
-    "Gula Merah": {"small": 0.015, "large": 0.03, "unit": "kg"},
-    "Gula Pasir": {"small": 0.01, "large": 0.02, "unit": "kg"},
-    "Kacang Panjang": {"small": 0.05, "large": 0.1, "unit": "kg"},
-    "Kentang": {"small": 0.08, "large": 0.15, "unit": "kg"},
-    "Minyak": {"small": 0.02, "large": 0.04, "unit": "kg"},
-    "Royco": {"small": 0.005, "large": 0.01, "unit": "kg"},
-    "Tahu": {"small": 0.05, "large": 0.1, "unit": "kg"},
-    "Tempe": {"small": 0.05, "large": 0.1, "unit": "kg"},
-    "Teri": {"small": 0.02, "large": 0.04, "unit": "kg"},
-    "Wortel": {"small": 0.05, "large": 0.1, "unit": "kg"},
-}
-
-# Regex helpers
-ANGKA_REGEX = re.compile(r"(\d+(?:[\.,]\d+)?)")
-FILE_DATE_REGEX = re.compile(r"(\d{1,2})[_\s-](\d{1,2})[_\s-](\d{2,4})")
+@st.cache_resource
+def get_store():
+    # One SQLite connection shared by every session and rerun
+    return StokStore()
+
+store = get_store()
 
 # -------------------------
 # SESSION STATE INIT
 # -------------------------
-if "penarikan_data" not in st.session_state:
-    st.session_state.penarikan_data = {}
-
+# Withdrawals are read from the store's ledger; porsi is loaded from the store once per
+# session. Gramasi is reloaded on every rerun, so edits made by other kitchens show up, and
+# saves only write the menus this session changed.
 if "porsi_data" not in st.session_state:
     st.session_state.porsi_data = {loc: {"small": 0, "large": 0} for loc in LOCATIONS}
+    st.session_state.porsi_data.update(store.load_porsi())
 
-if "needs_config" not in st.session_state:
-    st.session_state.needs_config = DEFAULT_NEEDS.copy()
+st.session_state.needs_config = store.load_needs_config()
+if not st.session_state.needs_config:
+    store.update_needs_config(DEFAULT_NEEDS)
+    st.session_state.needs_config = store.load_needs_config()
+
+if "synonyms" not in st.session_state:
+    st.session_state.synonyms = store.load_synonyms()
 
 # -------------------------
-# UTIL FUNCTIONS
+# CACHED COMPUTATIONS
 # -------------------------
-def parse_date_from_filename(fname):
-    m = FILE_DATE_REGEX.search(fname)
-    if not m:
-        return None
-    day, month, year = m.groups()
-    day = int(day)
-    month = int(month)
-    year = int(year)
-    if year < 100:
-        year += 2000
-    try:
-        return datetime(year, month, day).date()
-    except:
-        return None
-
-def extract_number(cell):
-    if cell is None:
-        return None
-    s = str(cell).replace(",", ".")
-    m = ANGKA_REGEX.search(s)
-    if not m:
-        return None
-    val = float(m.group(1))
-    if val.is_integer():
-        return int(val)
-    return val
-
-def extract_tables_from_pdf_path(pdf_path):
-    rows = []
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                for tbl in page.extract_tables() or []:
-                    rows.extend(tbl)
-    except Exception as e:
-        st.error(f"Error reading {pdf_path}: {e}")
-    if not rows:
-        return pd.DataFrame()
-    df = pd.DataFrame(rows)
-    df = df.dropna(how="all")
-    return df
-
-def normalize_raw_table(df_raw, source_filename):
-    if df_raw.empty:
-        return pd.DataFrame()
-
-    header_idx = None
-    for i, row in df_raw.iterrows():
-        joined = " ".join([str(x) for x in row.values if x is not None])
-        if "NAMA BARANG" in joined.upper():
-            header_idx = i
-            break
-    if header_idx is None:
-        header_idx = 0
-
-    df = df_raw.iloc[header_idx+1:].reset_index(drop=True).copy()
-    num_cols = df.shape[1]
-    colnames = []
-    for i in range(num_cols):
-        if i == 0:
-            colnames.append("NO")
-        elif i == 1:
-            colnames.append("NAMA BARANG")
-        else:
-            colnames.append(f"COL_{i}")
-    df.columns = colnames
-
-    dt = parse_date_from_filename(source_filename)
-    df["Tanggal"] = dt
-    df["Sumber File"] = source_filename
-
-    header_row_values = df_raw.iloc[header_idx] if header_idx < len(df_raw) else None
-    header_text = ""
-    if header_row_values is not None:
-        header_text = " ".join([str(x) for x in header_row_values if x is not None]).lower()
-
-    location_cols = {}
-    for loc in LOCATIONS:
-        if loc.lower() in header_text:
-            for j, val in enumerate(header_row_values):
-                if val and loc.lower() in str(val).lower():
-                    colname = colnames[j]
-                    location_cols[loc] = colname
-                    break
-
-    unmapped_locs = [l for l in LOCATIONS if l not in location_cols]
-    candidate_cols = [c for c in colnames if c.startswith("COL_")]
-    for idx, loc in enumerate(unmapped_locs):
-        if idx < len(candidate_cols):
-            location_cols[loc] = candidate_cols[idx]
-
-    tidy_rows = []
-    for _, row in df.iterrows():
-        item = str(row.get("NAMA BARANG", "")).strip()
-        if item == "" or item.lower() in ["", "nan", "no", "nama barang"]:
-            continue
-        entry = {
-            "NAMA BARANG": item,
-            "Tanggal": row["Tanggal"],
-            "Sumber File": row["Sumber File"]
-        }
-        total = 0
-        any_val = False
-        for loc, col in location_cols.items():
-            val = extract_number(row.get(col))
-            entry[loc] = val if val is not None else 0
-            if val:
-                any_val = True
-                try:
-                    total += float(val)
-                except:
-                    pass
-        entry["Total"] = total if any_val else None
-        tidy_rows.append(entry)
-
-    tidy_df = pd.DataFrame(tidy_rows)
-    cols_order = ["NAMA BARANG", "Tanggal"] + LOCATIONS + ["Total", "Sumber File"]
-    for c in cols_order:
-        if c not in tidy_df.columns:
-            tidy_df[c] = None
-    tidy_df = tidy_df[cols_order]
-    return tidy_df
-
-def process_uploaded_files(file_bytes_list, filenames):
-    tmpd = tempfile.mkdtemp()
-    pdf_paths = []
-    for b, fname in zip(file_bytes_list, filenames):
-        lower = fname.lower()
-        target = os.path.join(tmpd, fname)
-        with open(target, "wb") as f:
-            f.write(b)
-        if lower.endswith(".zip"):
-            try:
-                with zipfile.ZipFile(target, "r") as z:
-                    z.extractall(tmpd)
-                    for n in z.namelist():
-                        if n.lower().endswith(".pdf"):
-                            pdf_paths.append(os.path.join(tmpd, n))
-            except Exception as e:
-                st.warning(f"Gagal mengekstrak zip {fname}: {e}")
-        elif lower.endswith(".pdf"):
-            pdf_paths.append(target)
-
-    combined = []
-    for p in sorted(pdf_paths):
-        raw = extract_tables_from_pdf_path(p)
-        tidy = normalize_raw_table(raw, os.path.basename(p))
-        if not tidy.empty:
-            combined.append(tidy)
-
-    if combined:
-        df_all = pd.concat(combined, ignore_index=True)
-    else:
-        df_all = pd.DataFrame(columns=["NAMA BARANG", "Tanggal"] + LOCATIONS + ["Total", "Sumber File"])
-    df_all["Tanggal"] = pd.to_datetime(df_all["Tanggal"])
-    return df_all
-
-def rekap_per_day(df, date):
-    df_f = df[df["Tanggal"].dt.date == date]
-    if df_f.empty:
-        return pd.DataFrame()
-    agg = df_f.groupby("NAMA BARANG")[LOCATIONS].sum(min_count=1).fillna(0)
-    agg["Total"] = agg.sum(axis=1)
-    agg = agg.reset_index().sort_values("NAMA BARANG")
-    return agg
-
-def rekap_per_period(df, start_date, end_date):
-    mask = (df["Tanggal"].dt.date >= start_date) & (df["Tanggal"].dt.date <= end_date)
-    df_f = df[mask]
-    if df_f.empty:
-        return pd.DataFrame()
-    agg = df_f.groupby("NAMA BARANG")[LOCATIONS].sum(min_count=1).fillna(0)
-    agg["Total"] = agg.sum(axis=1)
-    agg = agg.reset_index().sort_values("NAMA BARANG")
-    return agg
-
-def rekap_per_week(df):
-    if df.empty:
-        return {}
-    min_date = df["Tanggal"].min().date()
-    df2 = df.copy()
-    df2["week_index"] = df2["Tanggal"].dt.date.apply(lambda d: ((d - min_date).days // 7) + 1)
-    weeks = {}
-    for w, group in df2.groupby("week_index"):
-        start = group["Tanggal"].dt.date.min()
-        end = group["Tanggal"].dt.date.max()
-        agg = group.groupby("NAMA BARANG")[LOCATIONS].sum(min_count=1).fillna(0)
-        agg["Total"] = agg.sum(axis=1)
-        weeks[f"Minggu {w} ({start} - {end})"] = agg.reset_index().sort_values("NAMA BARANG")
-    return weeks
+# Keyed on fingerprints of the session data (df_key / needs_key / penarikan_key); the
+# underscore arguments are not hashed, so a rerun only recomputes what actually changed.
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_rekap(df_key, mode, args, _cube):
+    if mode == "day":
+        return cube_rekap_day(_cube, *args)
+    if mode == "week":
+        return cube_rekap_week(_cube, *args)
+    if mode == "period":
+        return cube_rekap_period(_cube, *args)
+    return cube_rekap_total(_cube)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def cached_stock(df_key, loc, _cube):
+    return cube_stock_per_location(_cube, loc)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def cached_needs_cube(df_key, needs_key, porsi_key, penarikan_key, synonyms_key,
+                      _cube, _needs_config, _porsi, _penarikan, _item_index, _synonyms):
+    # Needs, stock and shortages for every item and location in one pass. Stock is matched
+    # to the gramasi names through the item index, not by exact string.
+    stock = {loc: match_stock(_needs_config, cached_stock(df_key, loc, _cube), _item_index, _synonyms)
+             for loc in LOCATIONS}
+    return build_needs_cube(_needs_config, portions_array(_porsi), stock, _penarikan)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def cached_forecast(df_key, needs_key, plan_key, withdrawals_key, synonyms_key,
+                    _cube, _needs_config, _plan_rows, _withdrawals, _item_index, _synonyms):
+    # First shortage date per item and location over the portion plan
+    plan = plan_frame(_plan_rows)
+    return forecast_shortages(_cube, _needs_config, plan, _withdrawals, _item_index, _synonyms)["shortages"]
+
+def needs_cube_for(porsi):
+    return cached_needs_cube(
+        df_key, needs_key, state_fingerprint(porsi), penarikan_key, state_fingerprint(synonyms),
+        rekap_cube, st.session_state.needs_config, porsi, penarikan_all, item_index, synonyms
+    )
 
 # -------------------------
 # UI
@@ -264,18 +130,220 @@ if uploaded:
         file_bytes.append(u.read())
         filenames.append(u.name)
 
-if st.button("🔄 Proses File"):
-    with st.spinner("Memproses file..."):
-        df_all = process_uploaded_files(file_bytes, filenames)
-        st.session_state.df_all = df_all
-        st.success(f"✅ Data berhasil diproses — {len(df_all)} baris")
+incremental = "df_all" in st.session_state and st.checkbox(
+    "➕ Tambahkan ke data yang sudah ada (hanya file baru/berubah yang diproses)"
+)
+
+# -------------------------
+# BACKGROUND INGESTION
+# -------------------------
+# Parsing runs in an IngestJob thread kept in session_state, so the page stays usable while
+# PDFs are processed. Each rerun shows the PDFs finished so far; a polling fragment reruns
+# the page whenever new results arrive and once more when the job is done.
+def show_partial(job):
+    # Only the PDFs delivered since the last rerun are applied, to a copy of the base cube
+    # (update_daily_cube works in place); the history frame itself is merged once, by
+    # finish_ingest, so this costs the new data, not the history
+    base = st.session_state.ingest_base
+    running = st.session_state.get("ingest_partial")
+    if running is None:
+        running = {"cube": None, "df": None, "parsed": {}, "base_files": {}}
+        if base["incremental"]:
+            running["cube"] = copy_daily_cube(base["rekap_cube"])
+            running["base_files"] = base["df_all"].groupby("Sumber File", observed=True).indices
+        st.session_state.ingest_partial = running
+    df_delta, parsed, st.session_state.ingest_shown = job.partial(st.session_state.ingest_shown)
+    running["parsed"].update(parsed)
+    # Re-uploaded files replace their rows from the history
+    replaced = [running["base_files"][name] for name in parsed if name in running["base_files"]]
+    if df_delta is None and not replaced:
+        return
+    if running["cube"] is None:
+        running["cube"] = build_daily_cube(df_delta)
+    else:
+        # replaced is only non-empty for incremental uploads, which have a base df_all
+        added = df_delta if df_delta is not None else base["df_all"].iloc[:0]
+        removed = base["df_all"].iloc[np.concatenate(replaced)] if replaced else added.iloc[:0]
+        running["cube"] = update_daily_cube(running["cube"], removed, added)
+    if not base["incremental"]:
+        # No history: df_all is the running merge of the PDFs finished so far
+        running["df"] = df_delta if running["df"] is None else merge_ingested(running["df"], df_delta, [])[0]
+        st.session_state.df_all = running["df"]
+    st.session_state.rekap_cube = running["cube"]
+    st.session_state.df_key = state_fingerprint([base["df_key"], "partial", sorted(running["parsed"].items())])
+    st.session_state.item_index = ItemIndex(running["cube"]["items"])
+
+def finish_ingest(job):
+    base = st.session_state.ingest_base
+    st.session_state.pop("ingest_partial", None)
+    if job.status == "error":
+        st.error(f"Gagal memproses file: {job.error}")
+        for key in ("df_all", "rekap_cube", "df_key", "source_hashes"):
+            if base[key] is None:
+                st.session_state.pop(key, None)
+            else:
+                st.session_state[key] = base[key]
+        st.session_state.pop("item_index", None)
+        return
+    df_new, report = job.df_new, job.report
+    timings = {"total": job.seconds, **report["timings"]}
+    for fname, msg in report["warnings"]:
+        st.warning(msg)
+    for fname, err in report["errors"]:
+        st.error(f"Error reading {fname}: {err}")
+    failed = {fname for fname, _ in report["errors"]}
+    parsed = {name: sha for name, sha in report["sources"].items() if name not in failed}
+
+    with stage(timings, "rekap cube"):
+        if base["incremental"]:
+            # Only the delta touches the existing data and its cube
+            df_all, removed = merge_ingested(base["df_all"], df_new, list(parsed))
+            st.session_state.rekap_cube = update_daily_cube(base["rekap_cube"], removed, df_new)
+            st.session_state.df_key = state_fingerprint([base["df_key"], sorted(parsed.items())])
+            st.session_state.source_hashes = {**base["source_hashes"], **parsed}
+        else:
+            df_all = df_new
+            st.session_state.rekap_cube = build_daily_cube(df_all)
+            st.session_state.df_key = frame_fingerprint(df_all)
+            st.session_state.source_hashes = parsed
+    st.session_state.df_all = df_all
+    st.session_state.item_index = ItemIndex(st.session_state.rekap_cube["items"])
+    with stage(timings, "simpan stok"):
+        snapshot_dates = cube_dates(st.session_state.rekap_cube) or [None]
+        store.save_stock_snapshot({loc: cube_stock_per_location(st.session_state.rekap_cube, loc) for loc in LOCATIONS},
+                                  start_date=snapshot_dates[0], end_date=snapshot_dates[-1])
+    if DATASET_AVAILABLE:
+        with stage(timings, "arsip parquet"):
+            # Only the dates touched by this upload are rewritten in the archive
+            touched = set(df_new.index.dropna().date)
+            if base["incremental"]:
+                touched |= set(removed.index.dropna().date)
+            write_partitions(stock_rows(df_all[pd.Index(df_all.index.date).isin(touched)]), "stok", dates=touched)
+    st.session_state.last_timings = {"timings": timings, "rows": len(df_new), "files": len(report["files"])}
+    st.success(f"✅ Data berhasil diproses — {len(df_all)} baris")
+    if base["incremental"]:
+        st.caption(f"{len(parsed)} file baru/berubah ditambahkan, {len(report['skipped'])} file tidak berubah dilewati")
+    st.caption(f"Cache: {report['cache_hits']} file dari cache, {report['cache_misses']} file diproses ulang")
+
+@st.fragment(run_every=1)
+def ingest_progress(job):
+    done, total, name = job.progress
+    st.progress(done / total if total else 0.0,
+                text=f"Memproses file {done}/{total}: {name}" if total else "Memproses file...")
+    st.caption("Tab di bawah menampilkan file yang sudah selesai; data diperbarui otomatis.")
+    if not job.running or job.result_count() != st.session_state.ingest_shown:
+        st.rerun()
+
+job = st.session_state.get("ingest_job")
+if st.button("🔄 Proses File", disabled=job is not None and job.running):
+    st.session_state.ingest_base = {
+        "incremental": incremental,
+        **{key: st.session_state.get(key) for key in ("df_all", "rekap_cube", "df_key", "source_hashes")},
+    }
+    known_sources = st.session_state.get("source_hashes", {}) if incremental else None
+    job = IngestJob(file_bytes, filenames, cache=TableCache(), known_sources=known_sources).start()
+    st.session_state.ingest_job = job
+    st.session_state.ingest_shown = 0
+    st.session_state.pop("ingest_partial", None)
+
+if job is not None:
+    if job.running:
+        if job.result_count() != st.session_state.ingest_shown:
+            show_partial(job)
+        ingest_progress(job)
+    else:
+        # Applied once, on the first rerun after the thread finished
+        del st.session_state.ingest_job
+        finish_ingest(job)
+
+if st.session_state.get("last_timings"):
+    with st.expander("⏱️ Rincian waktu proses terakhir"):
+        last = st.session_state.last_timings
+        total = last["timings"].get("total", 0)
+        st.caption(f"{last['files']} file, {last['rows']} baris"
+                   + (f" — {last['rows'] / total:.0f} baris/detik" if total else ""))
+        st.caption("Tahap di dalam worker dijumlahkan dari semua proses, sehingga bisa melebihi total waktu.")
+        st.dataframe(
+            pd.DataFrame([(k, round(v, 3)) for k, v in last["timings"].items()], columns=["Tahap", "Detik"]),
+            hide_index=True,
+        )
+
+# -------------------------
+# ARCHIVE QUERIES
+# -------------------------
+def archive_view():
+    # Recaps straight from the Parquet archive, so older history needs no re-upload
+    dates = dataset_dates("stok")
+    if not dates:
+        st.info("Arsip riwayat masih kosong — proses file untuk mengisinya.")
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        start_d = st.date_input("Dari tanggal:", dates[0], key="arsip_awal")
+    with col2:
+        end_d = st.date_input("Sampai tanggal:", dates[-1], key="arsip_akhir")
+    if start_d > end_d:
+        return
+    timings = {}
+    with stage(timings, "query"):
+        stock = query_rekap("stok", start_d, end_d)
+        withdrawn = query_rekap("penarikan", start_d, end_d)
+    st.caption(f"{len(dates)} hari di arsip ({dates[0]} - {dates[-1]}) — kueri {DATASET_ENGINE}, "
+               f"{timings['query'] * 1000:.0f} ms")
+    st.subheader("Stok masuk")
+    st.dataframe(stock, use_container_width=True)
+    st.subheader("Penarikan")
+    if withdrawn.empty:
+        st.caption("Belum ada penarikan pada periode ini.")
+    else:
+        st.dataframe(withdrawn, use_container_width=True)
 
 if "df_all" not in st.session_state:
     st.info("👆 Upload file dan klik 'Proses File' untuk memulai")
+    # Any session can read the stock left after the last processing and the withdrawals
+    # made in the period it covers
+    with st.expander("📦 Stok Terkini (dari proses terakhir)"):
+        loc_now = st.selectbox("Lokasi:", LOCATIONS, key="stok_terkini_loc")
+        snapshot_start, snapshot_end = store.stock_snapshot_range()
+        if snapshot_start is not None:
+            st.caption(f"Periode stok: {snapshot_start} - {snapshot_end}")
+        stock_now = store.current_stock(loc_now, snapshot_start, snapshot_end)
+        if stock_now:
+            st.dataframe(pd.DataFrame(list(stock_now.items()), columns=["Nama Barang", "Sisa Stok"]),
+                         hide_index=True, use_container_width=True)
+        else:
+            st.caption("Belum ada stok tersimpan untuk lokasi ini.")
+    if DATASET_AVAILABLE and dataset_dates("stok"):
+        with st.expander("🗄️ Arsip Riwayat", expanded=True):
+            archive_view()
     st.stop()
 
 df_all = st.session_state.df_all
-available_dates = sorted(df_all["Tanggal"].dt.date.unique())
+if "rekap_cube" not in st.session_state:
+    st.session_state.rekap_cube = build_daily_cube(df_all)
+if "df_key" not in st.session_state:
+    st.session_state.df_key = frame_fingerprint(df_all)
+if "source_hashes" not in st.session_state:
+    st.session_state.source_hashes = {}
+if "item_index" not in st.session_state:
+    st.session_state.item_index = ItemIndex(st.session_state.rekap_cube["items"])
+rekap_cube = st.session_state.rekap_cube
+item_index = st.session_state.item_index
+synonyms = st.session_state.synonyms
+df_key = st.session_state.df_key
+needs_key = state_fingerprint(st.session_state.needs_config)
+available_dates = cube_dates(rekap_cube)
+# Only withdrawals in the period of the loaded stock count against it
+stock_period = available_dates or [None]
+penarikan_all = store.withdrawal_totals(start_date=stock_period[0], end_date=stock_period[-1])
+penarikan_key = state_fingerprint(penarikan_all)
+plan_rows = store.load_portion_plan()
+if plan_rows:
+    withdrawal_days = store.withdrawal_daily()
+    forecast = cached_forecast(
+        df_key, needs_key, state_fingerprint(plan_rows), state_fingerprint(withdrawal_days), state_fingerprint(synonyms),
+        rekap_cube, st.session_state.needs_config, plan_rows, withdrawal_days, item_index, synonyms
+    )
 
 # -------------------------
 # MAIN FEATURE TABS
@@ -285,18 +353,20 @@ tab1, tab2, tab3, tab4 = st.tabs(["📋 Rekap Stok", "⚙️ Kelola Menu & Grama
 # TAB 1: REKAP STOK
 with tab1:
     st.header("Rekap Stok")
-    mode = st.radio("Mode rekap:", ("Per Hari", "Per Minggu", "Per Periode", "Total Semua"), horizontal=True)
+    modes = ("Per Hari", "Per Minggu", "Per Periode", "Total Semua") + (("Arsip Riwayat",) if DATASET_AVAILABLE else ())
+    mode = st.radio("Mode rekap:", modes, horizontal=True)
     
     if mode == "Per Hari":
         date_choice = st.selectbox("Pilih tanggal:", available_dates)
-        res = rekap_per_day(df_all, date_choice)
+        res = cached_rekap(df_key, "day", (date_choice,), rekap_cube)
         st.dataframe(res, use_container_width=True)
         
     elif mode == "Per Minggu":
-        weeks = rekap_per_week(df_all)
+        week_mode = st.selectbox("Kalender minggu:", list(WEEK_MODES), format_func=WEEK_MODES.get)
+        weeks = cube_weeks(rekap_cube, week_mode)
         if weeks:
             selected = st.selectbox("Pilih minggu:", list(weeks.keys()))
-            st.dataframe(weeks[selected], use_container_width=True)
+            st.dataframe(cached_rekap(df_key, "week", (weeks[selected],), rekap_cube), use_container_width=True)
             
     elif mode == "Per Periode":
         col1, col2 = st.columns(2)
@@ -305,31 +375,23 @@ with tab1:
         with col2:
             end_d = st.date_input("Tanggal akhir:", max(available_dates))
         if start_d <= end_d:
-            res = rekap_per_period(df_all, start_d, end_d)
+            res = cached_rekap(df_key, "period", (start_d, end_d), rekap_cube)
             st.dataframe(res, use_container_width=True)
             
-    else:  # Total Semua
-        agg = df_all.groupby("NAMA BARANG")[LOCATIONS].sum(min_count=1).fillna(0)
-        agg["Total"] = agg.sum(axis=1)
-        agg = agg.reset_index().sort_values("NAMA BARANG")
+    elif mode == "Total Semua":
+        agg = cached_rekap(df_key, "total", (), rekap_cube)
         st.dataframe(agg, use_container_width=True)
 
+    else:  # Arsip Riwayat
+        archive_view()
+
 # TAB 2: KELOLA MENU & GRAMASI
 with tab2:
     st.header("⚙️ Kelola Menu & Gramasi Bahan")
     st.markdown("**Edit gramasi atau tambah menu baru untuk perhitungan kebutuhan**")
     
     # Convert needs config to editable DataFrame
-    config_rows = []
-    for item, values in st.session_state.needs_config.items():
-        config_rows.append({
-            "Nama Menu": item,
-            "Gramasi Porsi Kecil": values.get("small", 0),
-            "Gramasi Porsi Besar": values.get("large", 0),
-            "Unit": values.get("unit", "kg")
-        })
-    
-    config_df = pd.DataFrame(config_rows)
+    config_df = needs_config_frame(st.session_state.needs_config)
     
     st.subheader("📝 Edit Gramasi Menu yang Ada")
     edited_config = st.data_editor(
@@ -362,20 +424,18 @@ with tab2:
     with col1:
         if st.button("💾 Simpan Perubahan"):
             # Update session state with edited values
-            new_config = {}
-            for _, row in edited_config.iterrows():
-                new_config[row["Nama Menu"]] = {
-                    "small": float(row["Gramasi Porsi Kecil"]),
-                    "large": float(row["Gramasi Porsi Besar"]),
-                    "unit": row["Unit"]
-                }
-            st.session_state.needs_config = new_config
+            new_config = needs_config_from_frame(edited_config)
+            old_config = st.session_state.needs_config
+            store.update_needs_config(
+                {item: v for item, v in new_config.items() if old_config.get(item) != v},
+                [item for item in old_config if item not in new_config],
+            )
             st.success("✅ Perubahan berhasil disimpan!")
             st.rerun()
     
     with col2:
         if st.button("🔄 Reset ke Default"):
-            st.session_state.needs_config = DEFAULT_NEEDS.copy()
+            store.save_needs_config(DEFAULT_NEEDS)
             st.success("✅ Reset ke konfigurasi default!")
             st.rerun()
     
@@ -401,11 +461,11 @@ with tab2:
                 if new_menu_name in st.session_state.needs_config:
                     st.warning(f"⚠️ Menu '{new_menu_name}' sudah ada!")
                 else:
-                    st.session_state.needs_config[new_menu_name] = {
+                    store.update_needs_config({new_menu_name: {
                         "small": new_small,
                         "large": new_large,
                         "unit": new_unit
-                    }
+                    }})
                     st.success(f"✅ Menu '{new_menu_name}' berhasil ditambahkan!")
                     st.rerun()
             else:
@@ -421,10 +481,39 @@ with tab2:
     
     if menu_to_delete != "-- Pilih Menu --":
         if st.button(f"🗑️ Hapus '{menu_to_delete}'"):
-            del st.session_state.needs_config[menu_to_delete]
+            store.update_needs_config(removed=[menu_to_delete])
             st.success(f"✅ Menu '{menu_to_delete}' berhasil dihapus!")
             st.rerun()
 
+    # Match gramasi names to the item names in the PDFs
+    st.markdown("---")
+    st.subheader("🔗 Pencocokan Nama Barang")
+    unmatched = unmatched_items(st.session_state.needs_config, item_index, synonyms)
+    if not unmatched:
+        st.caption("✅ Semua menu cocok dengan nama barang di PDF.")
+    else:
+        st.caption("Menu berikut tidak ditemukan persis di PDF. Pilih nama barang yang sesuai lalu simpan.")
+        none_option = "-- Tidak ada --"
+        all_keys = sorted(item_index.names, key=item_index.display_name)
+        choices = {}
+        for item, (confirmed, candidates) in unmatched.items():
+            # Suggestions first (best score first), then every other PDF item
+            keys = [k for k, _ in candidates] + [k for k in all_keys if k not in dict(candidates)]
+            labels = {k: item_index.display_name(k) for k in keys}
+            for k, score in candidates:
+                labels[k] = f"{labels[k]} ({score:.0%})"
+            options = [none_option] + keys
+            choice = st.selectbox(
+                item, options, index=options.index(confirmed) if confirmed in options else 0,
+                format_func=lambda k, labels=labels: labels.get(k, k), key=f"syn_{item}"
+            )
+            choices[canonical_key(item)] = None if choice == none_option else choice
+        if st.button("💾 Simpan Pencocokan"):
+            store.save_synonyms(choices)
+            st.session_state.synonyms = store.load_synonyms()
+            st.success("✅ Pencocokan nama barang disimpan!")
+            st.rerun()
+
 # TAB 3: INPUT PORSI & KEBUTUHAN
 with tab3:
     st.header("Input Porsi & Hitung Kebutuhan Bahan")
@@ -440,91 +529,68 @@ with tab3:
         if st.button("💾 Simpan Porsi"):
             st.session_state.porsi_data[selected_loc]["small"] = porsi_kecil
             st.session_state.porsi_data[selected_loc]["large"] = porsi_besar
+            store.save_porsi(selected_loc, porsi_kecil, porsi_besar)
             st.success("Porsi tersimpan!")
     
-    # Calculate needs
+    # Calculate needs (unsaved inputs of the selected location included)
     st.subheader(f"Kebutuhan Bahan - {selected_loc}")
-    needs_rows = []
-    for item, mapping in st.session_state.needs_config.items():
-        gramasi_small = mapping.get("small", 0)
-        gramasi_large = mapping.get("large", 0)
-        unit = mapping.get("unit", "kg")
-        
-        need_small = gramasi_small * porsi_kecil
-        need_large = gramasi_large * porsi_besar
-        total_need = need_small + need_large
-        
-        needs_rows.append({
-            "No": len(needs_rows) + 1,
-            "Nama Barang": item,
-            "Gramasi": f"{gramasi_small}/{gramasi_large}",
-            "Porsi Kecil": porsi_kecil,
-            "Porsi Besar": porsi_besar,
-            "Total Kuantiti Barang": total_need,
-            "Unit": unit,
-            "Penarikan Porsi": "",
-            "Pasarikan": 0
-        })
-    
-    needs_df = pd.DataFrame(needs_rows)
+    porsi_view = {**st.session_state.porsi_data, selected_loc: {"small": porsi_kecil, "large": porsi_besar}}
+    needs_cube = needs_cube_for(porsi_view)
+    needs_df = needs_table(needs_cube, selected_loc)
     
     # Display as editable table
     st.dataframe(needs_df, use_container_width=True)
     
-    # Download Excel
-    out_buf = io.BytesIO()
-    with pd.ExcelWriter(out_buf, engine="xlsxwriter") as writer:
-        needs_df.to_excel(writer, sheet_name="Kebutuhan", index=False)
-        
-        # Add current stock data
-        agg_stock = df_all.groupby("NAMA BARANG")[selected_loc].sum(min_count=1).reset_index()
-        agg_stock.columns = ["Nama Barang", "Stok Tersedia"]
-        agg_stock.to_excel(writer, sheet_name="Stok_Saat_Ini", index=False)
-    out_buf.seek(0)
-    
+    # Download Excel (workbook is only built when the button is clicked)
     st.download_button(
         f"📥 Download Kebutuhan {selected_loc}",
-        data=out_buf,
+        data=partial(kebutuhan_workbook, needs_df, cached_stock(df_key, selected_loc, rekap_cube)),
         file_name=f"kebutuhan_{selected_loc}_{datetime.now().strftime('%Y%m%d')}.xlsx"
     )
 
+    with st.expander("📊 Kebutuhan & kekurangan semua lokasi"):
+        st.markdown("**Total kebutuhan**")
+        st.dataframe(location_overview(needs_cube, "total_need"), hide_index=True, use_container_width=True)
+        st.markdown("**Kekurangan (kebutuhan − sisa stok)**")
+        st.dataframe(location_overview(needs_cube, "shortage"), hide_index=True, use_container_width=True)
+
+    # Date-indexed portion plan for all locations, imported in bulk
+    st.markdown("---")
+    st.subheader("📅 Rencana Porsi Harian")
+    st.caption("Upload CSV/Excel dengan kolom Tanggal, Lokasi, Porsi Kecil dan Porsi Besar (satu baris per tanggal dan lokasi).")
+    plan_file = st.file_uploader("Upload rencana porsi", type=["csv", "xlsx"], key="plan_file")
+    if plan_file is not None:
+        try:
+            new_plan = read_portion_plan(plan_file.getvalue(), plan_file.name)
+        except Exception as e:
+            st.error(f"Gagal membaca rencana porsi: {e}")
+        else:
+            st.caption(f"{len(new_plan)} baris, {new_plan['Tanggal'].min()} s/d {new_plan['Tanggal'].max()}")
+            replace_plan = st.checkbox("Ganti seluruh rencana lama", key="plan_replace")
+            if st.button("💾 Simpan Rencana"):
+                n = store.save_portion_plan(new_plan.itertuples(index=False, name=None), replace=replace_plan)
+                st.success(f"✅ {n} baris rencana porsi disimpan!")
+                st.rerun()
+
+    if plan_rows:
+        plan_df = plan_frame(plan_rows)
+        st.caption(f"Rencana tersimpan: {len(plan_df)} baris, {plan_df['Tanggal'].min()} s/d {plan_df['Tanggal'].max()}")
+        st.markdown("**🔮 Prakiraan kekurangan stok** (stok harian dari PDF − penarikan − kebutuhan rencana)")
+        if forecast.empty:
+            st.success("✅ Stok cukup untuk seluruh rencana porsi.")
+        else:
+            st.dataframe(forecast, hide_index=True, use_container_width=True)
+
 # TAB 4: PENARIKAN BARANG
 with tab4:
     st.header("Penarikan Barang & Pengurangan Porsi")
     
     loc_tarik = st.selectbox("Pilih Lokasi untuk Penarikan:", LOCATIONS, key="loc_tarik")
     
-    # Get current stock
-    current_stock = df_all.groupby("NAMA BARANG")[loc_tarik].sum(min_count=1).to_dict()
-    
-    # Get current needs
-    porsi_s = st.session_state.porsi_data[loc_tarik]["small"]
-    porsi_l = st.session_state.porsi_data[loc_tarik]["large"]
-    
     st.subheader("Tabel Penarikan Barang")
     
-    penarikan_rows = []
-    for item, mapping in st.session_state.needs_config.items():
-        stock = current_stock.get(item, 0)
-        need = (mapping.get("small", 0) * porsi_s) + (mapping.get("large", 0) * porsi_l)
-        
-        # Get previous withdrawal
-        prev_withdraw = st.session_state.penarikan_data.get(loc_tarik, {}).get(item, 0)
-        
-        remaining = stock - prev_withdraw
-        
-        penarikan_rows.append({
-            "No": len(penarikan_rows) + 1,
-            "Nama Barang": item,
-            "Stok Tersedia": stock,
-            "Kebutuhan": need,
-            "Penarikan Sebelumnya": prev_withdraw,
-            "Sisa Stok": remaining,
-            "Penarikan Baru": 0,
-            "Status": "✅ Cukup" if remaining >= need else "⚠️ Kurang"
-        })
-    
-    penarikan_df = pd.DataFrame(penarikan_rows)
+    # Saved portions of every location; the cube is shared with tab 3 when nothing is unsaved
+    penarikan_df = penarikan_table(needs_cube_for(st.session_state.porsi_data), loc_tarik)
     
     # Editable table for new withdrawals
     st.markdown("**Input penarikan baru di kolom 'Penarikan Baru':**")
@@ -544,30 +610,40 @@ with tab4:
     )
     
     if st.button("💾 Simpan Penarikan"):
-        if loc_tarik not in st.session_state.penarikan_data:
-            st.session_state.penarikan_data[loc_tarik] = {}
-        
-        for _, row in edited_df.iterrows():
-            item = row["Nama Barang"]
-            new_withdraw = row["Penarikan Baru"]
-            if new_withdraw > 0:
-                current = st.session_state.penarikan_data[loc_tarik].get(item, 0)
-                st.session_state.penarikan_data[loc_tarik][item] = current + new_withdraw
+        # One batched insert into the withdrawal ledger for the whole table
+        store.record_withdrawals(loc_tarik, zip(edited_df["Nama Barang"], edited_df["Penarikan Baru"]))
+        if DATASET_AVAILABLE:
+            today = datetime.now().date().isoformat()
+            write_partitions(withdrawal_rows([w for w in store.withdrawal_daily() if w[2] == today]), "penarikan")
         
         st.success("✅ Penarikan berhasil disimpan!")
         st.rerun()
     
-    # Download penarikan report
-    out_buf2 = io.BytesIO()
-    with pd.ExcelWriter(out_buf2, engine="xlsxwriter") as writer:
-        edited_df.to_excel(writer, sheet_name="Penarikan", index=False)
-    out_buf2.seek(0)
+    if plan_rows:
+        loc_forecast = forecast[forecast["Lokasi"] == loc_tarik]
+        if not loc_forecast.empty:
+            st.warning(f"⚠️ Menurut rencana porsi, {len(loc_forecast)} barang akan kurang di {loc_tarik}")
+            st.dataframe(loc_forecast, hide_index=True, use_container_width=True)
     
+    # Download penarikan report
     st.download_button(
         f"📥 Download Laporan Penarikan {loc_tarik}",
-        data=out_buf2,
+        data=partial(penarikan_workbook, edited_df),
         file_name=f"penarikan_{loc_tarik}_{datetime.now().strftime('%Y%m%d')}.xlsx"
     )
 
+st.markdown("---")
+st.subheader("📦 Ekspor Semua Lokasi")
+st.caption("Rekap harian, mingguan & total serta kebutuhan, stok dan penarikan untuk semua lokasi dalam satu file Excel.")
+st.download_button(
+    "📥 Download Laporan Lengkap",
+    data=partial(
+        bulk_workbook, rekap_cube, dict(st.session_state.needs_config),
+        {loc: dict(v) for loc, v in st.session_state.porsi_data.items()},
+        penarikan_all, item_index, dict(synonyms),
+    ),
+    file_name=f"laporan_lengkap_{datetime.now().strftime('%Y%m%d')}.xlsx"
+)
+
 st.markdown("---")
 st.info("💡 **Tips:** Gunakan tab 'Input Porsi' untuk menghitung kebutuhan, lalu tab 'Penarikan Barang' untuk mencatat pengambilan stok.")
\ No newline at end of file
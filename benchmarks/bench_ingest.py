@@ -0,0 +1,142 @@
+"""Headless ingestion benchmark (no Streamlit needed).
+
+Runs process_uploaded_files and the recap functions on the bundled sample ZIP and on
+synthetic copies scaled up by re-dating its PDFs, then prints per-stage wall time,
+peak RSS and rows/second:
+
+    python benchmarks/bench_ingest.py                 # 1x and 10x
+    python benchmarks/bench_ingest.py --scale 1 10 100 --workers 4
+    python benchmarks/bench_ingest.py --json bench.json
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stok.cache import TableCache  # noqa: E402
+from stok.ingest import process_uploaded_files  # noqa: E402
+from stok.parsing import parse_date_from_filename  # noqa: E402
+from stok.recap import (  # noqa: E402
+    build_daily_cube,
+    cube_dates,
+    cube_rekap_day,
+    cube_rekap_period,
+    cube_rekap_total,
+    cube_rekap_week,
+    cube_weeks,
+    rekap_per_day,
+    rekap_per_period,
+    rekap_per_week,
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SAMPLE_ZIP = os.path.join(ROOT, "24  NOV - 05 DES - 1_12_25.zip")
+
+def peak_rss_mb():
+    # Peak resident set size of this process and of finished worker processes (Linux: KiB)
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(own / scale, 1), round(children / scale, 1)
+
+def scaled_zip(sample_bytes, scale):
+    # scale copies of every sample PDF; copy k is shifted k*14 days so dates do not collide
+    if scale == 1:
+        return sample_bytes
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(sample_bytes)) as src, zipfile.ZipFile(out, "w") as dst:
+        members = [n for n in src.namelist() if n.lower().endswith(".pdf")]
+        payloads = {n: src.read(n) for n in members}
+        for k in range(scale):
+            for n in members:
+                d = parse_date_from_filename(n) or date(2025, 1, 1)
+                d = d + timedelta(days=14 * k)
+                dst.writestr(f"salinan {k:03d} - {d.day}_{d.month}_{d.year % 100}.pdf", payloads[n])
+    return out.getvalue()
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def bench_recaps(df):
+    timings = {}
+    dates = sorted(set(df.index.dropna().date))
+    if not dates:
+        return timings
+    _, timings["rekap_per_day (all days)"] = timed(lambda: [rekap_per_day(df, d) for d in dates])
+    _, timings["rekap_per_period (full range)"] = timed(rekap_per_period, df, dates[0], dates[-1])
+    _, timings["rekap_per_week"] = timed(rekap_per_week, df)
+    cube, timings["build_daily_cube"] = timed(build_daily_cube, df)
+    days = cube_dates(cube)
+    _, timings["cube day (all days)"] = timed(lambda: [cube_rekap_day(cube, d) for d in days])
+    _, timings["cube period (full range)"] = timed(cube_rekap_period, cube, days[0], days[-1])
+    _, timings["cube weeks (all)"] = timed(lambda: [cube_rekap_week(cube, r) for r in cube_weeks(cube).values()])
+    _, timings["cube total"] = timed(cube_rekap_total, cube)
+    return timings
+
+def run(scale, sample_bytes, workers, cache_dir):
+    data = scaled_zip(sample_bytes, scale)
+    cache = TableCache(cache_dir) if cache_dir else None
+    start = time.perf_counter()
+    df, report = process_uploaded_files([data], [f"bench_{scale}x.zip"], max_workers=workers, cache=cache)
+    wall = time.perf_counter() - start
+    return {
+        "scale": scale,
+        "pdfs": len(report["files"]),
+        "rows": len(df),
+        "errors": len(report["errors"]),
+        "ingest_wall_s": round(wall, 3),
+        "rows_per_s": round(len(df) / wall, 1) if wall else None,
+        "df_all_kb (tidy, compact)": (round(report["memory"]["tidy_bytes"] / 1024, 1),
+                                      round(report["memory"]["compact_bytes"] / 1024, 1)),
+        "ingest_stages_s": {k: round(v, 4) for k, v in report["timings"].items()},
+        "recap_stages_s": {k: round(v, 4) for k, v in bench_recaps(df).items()},
+        "peak_rss_mb (self, workers)": peak_rss_mb(),
+    }
+
+def print_result(res):
+    print(f"\n== {res['scale']}x: {res['pdfs']} PDF, {res['rows']} baris, {res['errors']} error ==")
+    print(f"  ingest wall      {res['ingest_wall_s']:>10.3f} s   ({res['rows_per_s']} baris/detik)")
+    for name, seconds in res["ingest_stages_s"].items():
+        print(f"  {name:<32}{seconds:>10.4f} s")
+    for name, seconds in res["recap_stages_s"].items():
+        print(f"  {name:<32}{seconds:>10.4f} s")
+    print(f"  df_all KB (tidy, compact):   {res['df_all_kb (tidy, compact)']}")
+    print(f"  peak RSS MB (self, workers): {res['peak_rss_mb (self, workers)']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--zip", default=SAMPLE_ZIP, help="sample ZIP of daily PDFs")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10], help="copies of the sample per run")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: STOK_MAX_WORKERS / CPU count)")
+    parser.add_argument("--cache-dir", default=None, help="use a TableCache in this directory")
+    parser.add_argument("--json", default=None, help="also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    with open(args.zip, "rb") as f:
+        sample_bytes = f.read()
+    results = []
+    for scale in args.scale:
+        res = run(scale, sample_bytes, args.workers, args.cache_dir)
+        print_result(res)
+        results.append(res)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
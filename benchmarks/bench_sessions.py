@@ -0,0 +1,269 @@
+"""Headless load test of app.py: N concurrent Streamlit sessions.
+
+Every session is a streamlit.testing AppTest driven in its own process, so reruns of
+different sessions really overlap. AppTest installs a process-global mock Runtime for the
+length of a run, which would serialize sessions sharing one process. Sessions share the
+SQLite store and the TableCache on disk. Each session:
+
+    1. opens the app
+    2. uploads the sample ZIP and clicks 'Proses File', then reruns every POLL_SECONDS
+       (what the progress fragment does) until the background ingestion has been applied
+    3. switches through every recap mode
+    4. saves the withdrawal table
+
+repeated --rounds times. Prints p50/p95 latency per step and the memory each session's
+st.session_state holds:
+
+    python benchmarks/bench_sessions.py                  # 7 sessions, one per kitchen
+    python benchmarks/bench_sessions.py --sessions 1 7 14 --rounds 3
+    python benchmarks/bench_sessions.py --json sessions.json
+
+Compared with one server process, each session here has its own st.cache_data /
+st.cache_resource (no cache hits from other sessions) and its own GIL (CPU-bound reruns do
+not queue behind other sessions). Each session also writes its own Parquet archive
+(<STOK_DATASET_DIR>/session-<k>), since the archive's write lock only covers one process.
+
+The store, parsed-table cache and Parquet archive go to a temporary directory that is
+removed afterwards, unless STOK_DB_PATH / STOK_CACHE_DIR / STOK_DATASET_DIR are set.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from queue import Empty
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+APP = os.path.join(ROOT, "app.py")
+SAMPLE_ZIP = os.path.join(ROOT, "24  NOV - 05 DES - 1_12_25.zip")
+RECAP_MODES = ("Per Hari", "Per Minggu", "Per Periode", "Total Semua")
+
+POLL_SECONDS = 1.0
+
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+def state_bytes(value, seen=None):
+    # Deep size of a session_state value; frames and arrays by their buffers
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(state_bytes(k, seen) + state_bytes(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(state_bytes(v, seen) for v in value)
+    if hasattr(value, "__dict__") and not isinstance(value, type):
+        return sys.getsizeof(value) + state_bytes(vars(value), seen)
+    return sys.getsizeof(value)
+
+def session_memory(at):
+    # {key: bytes} of one session's state; widget values (the uploaded ZIP included) are
+    # summed under "(widget)"
+    memory = {}
+    for key, value in at.session_state.to_dict().items():
+        name = "(widget)" if key.startswith("$$") else key
+        memory[name] = memory.get(name, 0) + state_bytes(value)
+    return memory
+
+class Session:
+    # One simulated user; every rerun is timed under the name of the step that caused it
+
+    def __init__(self, zip_bytes, zip_name, rounds):
+        self.zip_bytes = zip_bytes
+        self.zip_name = zip_name
+        self.rounds = rounds
+        self.latencies = []
+        self.error = None
+        self.memory = {}
+
+    def _timed(self, step, action):
+        start = time.perf_counter()
+        at = action()
+        self.latencies.append((step, time.perf_counter() - start))
+        if at.exception:
+            raise RuntimeError(f"{step}: {at.exception[0].message}")
+        return at
+
+    def _upload(self, at):
+        start = time.perf_counter()
+        uploader = at.get("file_uploader")[0]
+        self._timed("upload", lambda: uploader.set_value((self.zip_name, self.zip_bytes, "application/zip")).run())
+        process = next(b for b in at.button if b.label.startswith("🔄 Proses File"))
+        self._timed("klik proses", lambda: process.click().run())
+        while "ingest_job" in at.session_state:
+            time.sleep(POLL_SECONDS)
+            self._timed("polling progres", at.run)
+        if "df_all" not in at.session_state:
+            raise RuntimeError("upload: data tidak terbentuk")
+        self.latencies.append(("upload -> data siap", time.perf_counter() - start))
+
+    def run(self):
+        from streamlit.testing.v1 import AppTest
+
+        try:
+            at = AppTest.from_file(APP, default_timeout=300)
+            self._timed("buka app", at.run)
+            for _ in range(self.rounds):
+                self._upload(at)
+                for mode in RECAP_MODES:
+                    self._timed(f"rekap {mode}", lambda: at.radio[0].set_value(mode).run())
+                save = next(b for b in at.button if b.label.startswith("💾 Simpan Penarikan"))
+                self._timed("simpan penarikan", lambda: save.click().run())
+            self.memory = session_memory(at)
+        except Exception as e:
+            self.error = str(e)
+
+def _session_process(k, zip_bytes, zip_name, rounds, barrier, results):
+    # One session per process; all sessions start together once every process is ready
+    session = Session(zip_bytes, zip_name, rounds)
+    try:
+        os.environ["STOK_DATASET_DIR"] = os.path.join(os.environ["STOK_DATASET_DIR"], f"session-{k}")
+        os.chdir(ROOT)
+        from streamlit.testing.v1 import AppTest  # noqa: F401  (imported before the start)
+    except Exception as e:
+        barrier.abort()
+        session.error = str(e)
+    else:
+        try:
+            barrier.wait()
+            session.run()
+        except threading.BrokenBarrierError:
+            session.error = "sesi lain gagal dimulai"
+    results.put((k, session.latencies, session.error, session.memory, peak_rss_mb()))
+
+def _collect(queue, processes):
+    # Drain the queue before joining, or a process blocks on its unread result; a process
+    # that died without a result is reported as an error
+    sessions = []
+    while len(sessions) < len(processes):
+        try:
+            sessions.append(queue.get(timeout=POLL_SECONDS))
+        except Empty:
+            if not any(p.is_alive() for p in processes):
+                break
+    while len(sessions) < len(processes):
+        try:
+            sessions.append(queue.get(timeout=POLL_SECONDS))
+        except Empty:
+            break
+    done = {k for k, *_ in sessions}
+    sessions += [(k, [], f"proses sesi {k} berhenti tanpa hasil", {}, None)
+                 for k in range(len(processes)) if k not in done]
+    return sorted(sessions)
+
+def run(n_sessions, zip_bytes, zip_name, rounds):
+    barrier = MP_CONTEXT.Barrier(n_sessions + 1)
+    queue = MP_CONTEXT.Queue()
+    processes = [MP_CONTEXT.Process(target=_session_process, name=f"session-{k}",
+                                    args=(k, zip_bytes, zip_name, rounds, barrier, queue))
+                 for k in range(n_sessions)]
+    for p in processes:
+        p.start()
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    start = time.perf_counter()
+    sessions = _collect(queue, processes)
+    wall = time.perf_counter() - start
+    for p in processes:
+        p.join()
+
+    by_step = {}
+    for _, latencies, _, _, _ in sessions:
+        for step, seconds in latencies:
+            by_step.setdefault(step, []).append(seconds)
+    # "upload -> data siap" spans several reruns and is not a rerun itself
+    all_reruns = [seconds for _, latencies, _, _, _ in sessions for step, seconds in latencies
+                  if step != "upload -> data siap"]
+    per_session = [sum(memory.values()) / 1024 / 1024 for _, _, _, memory, _ in sessions if memory]
+    rss = [mb for _, _, _, _, mb in sessions if mb is not None]
+    return {
+        "sessions": n_sessions,
+        "rounds": rounds,
+        "errors": [error for _, _, error, _, _ in sessions if error],
+        "wall_s": round(wall, 3),
+        "reruns": len(all_reruns),
+        "latency_ms": {step: percentiles(values) for step, values in by_step.items()},
+        "latency_ms (all reruns)": percentiles(all_reruns),
+        "session_state_mb (mean, max)": (round(float(np.mean(per_session)), 2), round(max(per_session), 2))
+        if per_session else None,
+        "session_state_mb by key (first session)": {k: round(v / 1024 / 1024, 3) for k, v in
+                                                     sorted(sessions[0][3].items(), key=lambda kv: -kv[1])},
+        "peak_rss_mb (max, sum of sessions)": (max(rss), round(sum(rss), 1)) if rss else None,
+    }
+
+def percentiles(seconds):
+    values = np.asarray(seconds) * 1000
+    if not len(values):
+        return None
+    return {"n": len(values), "p50": round(float(np.percentile(values, 50)), 1),
+            "p95": round(float(np.percentile(values, 95)), 1), "max": round(float(values.max()), 1)}
+
+def print_result(res):
+    print(f"\n== {res['sessions']} sesi x {res['rounds']} putaran: {res['reruns']} rerun, {res['wall_s']:.1f} s ==")
+    for err in res["errors"]:
+        print(f"  ERROR {err}")
+    print(f"  {'langkah':<24}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    rows = list(res["latency_ms"].items()) + [("semua rerun", res["latency_ms (all reruns)"])]
+    for step, p in rows:
+        if p:
+            print(f"  {step:<24}{p['n']:>6}{p['p50']:>10.1f}{p['p95']:>10.1f}{p['max']:>10.1f}")
+    print(f"  session_state MB (rata-rata, maks): {res['session_state_mb (mean, max)']}")
+    for key, mb in list(res["session_state_mb by key (first session)"].items())[:6]:
+        print(f"    {key:<22}{mb:>10.3f} MB")
+    print(f"  peak RSS MB per proses sesi (maks, jumlah): {res['peak_rss_mb (max, sum of sessions)']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--zip", default=SAMPLE_ZIP, help="sample ZIP of daily PDFs uploaded by every session")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[7], help="concurrent sessions per run")
+    parser.add_argument("--rounds", type=int, default=1, help="upload/recap/save rounds per session")
+    parser.add_argument("--json", default=None, help="also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    # Files only outlive the run in the STOK_* paths the user set; the rest is removed
+    with tempfile.TemporaryDirectory(prefix="bench_sessions_", ignore_cleanup_errors=True) as tmp:
+        os.environ.setdefault("STOK_DB_PATH", os.path.join(tmp, "stok.db"))
+        os.environ.setdefault("STOK_CACHE_DIR", os.path.join(tmp, "cache"))
+        os.environ.setdefault("STOK_DATASET_DIR", os.path.join(tmp, "dataset"))
+        # app.py opens relative paths and AppTest resolves the script from here
+        os.chdir(ROOT)
+
+        with open(args.zip, "rb") as f:
+            zip_bytes = f.read()
+        results = []
+        for n in args.sessions:
+            res = run(n, zip_bytes, os.path.basename(args.zip), args.rounds)
+            print_result(res)
+            results.append(res)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if any(res["errors"] for res in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
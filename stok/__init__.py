@@ -0,0 +1,52 @@
+# Core stock library behind app.py and the `python -m stok` CLI; no Streamlit needed.
+# Public names are re-exported lazily so `import stok` stays cheap: a submodule (and its
+# pandas / numpy / pdfplumber imports) is only loaded when one of its names is used.
+import importlib
+
+_EXPORTS = {
+    "LOCATIONS": "config",
+    "DEFAULT_NEEDS": "config",
+    "TableCache": "cache",
+    "StokStore": "store",
+    "process_uploaded_files": "ingest",
+    "merge_ingested": "ingest",
+    "IngestJob": "jobs",
+    "normalize_raw_table": "parsing",
+    "parse_date_from_filename": "parsing",
+    "parse_quantity": "quantity",
+    "parse_quantities": "quantity",
+    "build_daily_cube": "recap",
+    "copy_daily_cube": "recap",
+    "update_daily_cube": "recap",
+    "cube_dates": "recap",
+    "cube_rekap_day": "recap",
+    "cube_rekap_period": "recap",
+    "cube_rekap_total": "recap",
+    "cube_rekap_week": "recap",
+    "cube_weeks": "recap",
+    "cube_stock_per_location": "recap",
+    "ItemIndex": "items",
+    "canonical_key": "items",
+    "match_stock": "items",
+    "build_needs_cube": "needs",
+    "portions_array": "needs",
+    "needs_table": "needs",
+    "penarikan_table": "needs",
+    "read_portion_plan": "plan",
+    "forecast_shortages": "plan",
+    "bulk_workbook": "export",
+    "write_partitions": "dataset",
+    "query_rekap": "dataset",
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,144 @@
+import os
+import json
+import hashlib
+import importlib.util
+import tempfile
+import pandas as pd
+
+from .config import PARSER_VERSION
+
+# -------------------------
+# CACHE SETTINGS
+# -------------------------
+CACHE_DIR = os.environ.get("STOK_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pdf_stok"))
+CACHE_MAX_BYTES = int(os.environ.get("STOK_CACHE_MAX_MB", "200")) * 1024 * 1024
+
+# Parquet when pyarrow is installed; checked without importing it
+CACHE_FORMAT = "parquet" if importlib.util.find_spec("pyarrow") else "pkl"
+
+# Layout templates of the table extraction, shared by every ingestion using this cache dir
+TEMPLATES_FILE = "layout_templates.json"
+MAPPING_SUFFIX = ".mapping.json"
+
+# Columns derived from the file name are re-stamped on every hit, so the same
+# PDF uploaded under another name still gets its own date and source.
+STAMPED_COLUMNS = ["Tanggal", "Sumber File"]
+
+def content_key(sha256_hex):
+    return f"{sha256_hex}-v{PARSER_VERSION}"
+
+class TableCache:
+    # Parsed tidy tables on disk, keyed by PDF content hash + parser version.
+    # Least recently used entries are evicted once the directory exceeds max_bytes.
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.{CACHE_FORMAT}")
+
+    def _mapping_name(self, key):
+        # Column mapping report of the entry, replayed on hits like a fresh parse
+        return f"{key}{MAPPING_SUFFIX}"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if CACHE_FORMAT == "parquet":
+                df = pd.read_parquet(path)
+            else:
+                df = pd.read_pickle(path)
+        except (FileNotFoundError, OSError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return df
+
+    def get_mapping(self, key):
+        return self._read_json(self._mapping_name(key))
+
+    def put(self, key, df, mapping=None):
+        df = df.drop(columns=[c for c in STAMPED_COLUMNS if c in df.columns])
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            if CACHE_FORMAT == "parquet":
+                df.to_parquet(tmp, index=False)
+            else:
+                df.to_pickle(tmp)
+            os.replace(tmp, self._path(key))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        if mapping:
+            self._write_json(self._mapping_name(key), mapping)
+        self.evict()
+
+    def _write_json(self, name, obj):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(obj, f, default=str)
+            os.replace(tmp, os.path.join(self.directory, name))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _read_json(self, name):
+        try:
+            with open(os.path.join(self.directory, name)) as f:
+                return json.load(f)
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+
+    def load_templates(self):
+        # {layout signature (tuple): template} saved by earlier ingestions
+        return {tuple(sig): template for sig, template in self._read_json(TEMPLATES_FILE) or []}
+
+    def save_templates(self, templates):
+        self._write_json(TEMPLATES_FILE, [[list(sig), template] for sig, template in templates.items()])
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(f".{CACHE_FORMAT}"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+            try:
+                os.remove(path[:-len(f".{CACHE_FORMAT}")] + MAPPING_SUFFIX)
+            except OSError:
+                pass
+
+# -------------------------
+# FINGERPRINTS
+# -------------------------
+# Cheap content keys for memoizing UI computations on session data
+def frame_fingerprint(df):
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update(",".join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+def state_fingerprint(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
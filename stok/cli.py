@@ -0,0 +1,141 @@
+"""Headless recap run for cron jobs (no Streamlit needed).
+
+Parses a ZIP or a directory of daily PDFs and writes the recaps next to each other:
+
+    python -m stok "24  NOV - 05 DES - 1_12_25.zip" -o rekap/
+    python -m stok arsip_pdf/ -o rekap/ --periode 2025-11-24 2025-12-05 --excel
+    python -m stok arsip_pdf/ -o rekap/ --simpan-stok    # also refresh the app's stock snapshot
+    python -m stok arsip_pdf/ -o rekap/ --arsip          # also update the Parquet history archive
+
+Exits with status 1 when a file could not be parsed, so cron can flag the run.
+"""
+import argparse
+import os
+import sys
+from datetime import date, datetime
+
+def _collect_inputs(paths):
+    # Files as given, directories scanned (non-recursively) for PDFs and ZIPs
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith((".pdf", ".zip")):
+                    found.append(os.path.join(path, name))
+        else:
+            found.append(path)
+    file_bytes, filenames = [], []
+    for path in found:
+        with open(path, "rb") as f:
+            file_bytes.append(f.read())
+        filenames.append(os.path.basename(path))
+    return file_bytes, filenames
+
+def _stacked(frames, column):
+    # frames: iterable of (label, recap DataFrame) -> one table with the label in front
+    import pandas as pd
+
+    parts = []
+    for label, df in frames:
+        if not df.empty:
+            df = df.copy()
+            df.insert(0, column, label)
+            parts.append(df)
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+def write_recaps(cube, out_dir, period=None, week_mode="relative"):
+    # Total, daily and weekly recaps (plus one period when given) as CSV; returns the paths
+    from .recap import cube_dates, cube_rekap_day, cube_rekap_period, cube_rekap_total, cube_rekap_week, cube_weeks
+
+    tables = {
+        "rekap_total.csv": cube_rekap_total(cube),
+        "rekap_harian.csv": _stacked(((d.isoformat(), cube_rekap_day(cube, d)) for d in cube_dates(cube)), "Tanggal"),
+        "rekap_mingguan.csv": _stacked(((label, cube_rekap_week(cube, rng)) for label, rng in cube_weeks(cube, week_mode).items()),
+                                      "Minggu"),
+    }
+    if period:
+        start, end = period
+        tables[f"rekap_periode_{start.isoformat()}_{end.isoformat()}.csv"] = cube_rekap_period(cube, start, end)
+    paths = []
+    for name, df in tables.items():
+        path = os.path.join(out_dir, name)
+        df.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m stok", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="ZIP/PDF files or directories containing them")
+    parser.add_argument("-o", "--out", default=".", help="output directory (created if missing)")
+    parser.add_argument("--periode", nargs=2, metavar=("AWAL", "AKHIR"), type=date.fromisoformat,
+                        help="also write a recap for this date range (YYYY-MM-DD)")
+    parser.add_argument("--minggu", choices=["relative", "monday", "iso"], default="relative",
+                        help="week calendar of rekap_mingguan.csv: 7-day blocks from the first date, "
+                             "Monday-to-Sunday or ISO weeks (default: relative)")
+    parser.add_argument("--excel", action="store_true", help="also write the full all-location Excel report")
+    parser.add_argument("--simpan-stok", action="store_true", help="save the stock snapshot to the store (STOK_DB_PATH)")
+    parser.add_argument("--arsip", action="store_true",
+                        help="write the stock and withdrawal Parquet archive (STOK_DATASET_DIR)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: STOK_MAX_WORKERS / CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the parsed-table cache (STOK_CACHE_DIR)")
+    args = parser.parse_args(argv)
+
+    from .cache import TableCache
+    from .config import DEFAULT_NEEDS, LOCATIONS
+    from .ingest import process_uploaded_files
+    from .recap import build_daily_cube, cube_dates, cube_stock_per_location
+
+    file_bytes, filenames = _collect_inputs(args.inputs)
+    if not filenames:
+        print("Tidak ada file PDF/ZIP yang ditemukan.", file=sys.stderr)
+        return 2
+
+    cache = None if args.no_cache else TableCache()
+    df_all, report = process_uploaded_files(file_bytes, filenames, max_workers=args.workers, cache=cache)
+    for fname, msg in report["warnings"]:
+        print(f"Peringatan: {msg}", file=sys.stderr)
+    for fname, err in report["errors"]:
+        print(f"Error reading {fname}: {err}", file=sys.stderr)
+    print(f"{len(report['files'])} file PDF, {len(df_all)} baris "
+          f"({report['cache_hits']} dari cache, {report['cache_misses']} diproses)")
+
+    os.makedirs(args.out, exist_ok=True)
+    cube = build_daily_cube(df_all)
+    paths = write_recaps(cube, args.out, args.periode, args.minggu)
+
+    if args.excel or args.simpan_stok or args.arsip:
+        from .store import StokStore
+
+        store = StokStore()
+        if args.arsip:
+            from .dataset import DATASET_AVAILABLE, DATASET_DIR, stock_rows, withdrawal_rows, write_partitions
+
+            if DATASET_AVAILABLE:
+                write_partitions(stock_rows(df_all), "stok")
+                write_partitions(withdrawal_rows(store.withdrawal_daily()), "penarikan")
+                paths.append(DATASET_DIR)
+            else:
+                print("Peringatan: pyarrow tidak terpasang, arsip Parquet dilewati.", file=sys.stderr)
+        # Withdrawals only count against the stock of the period they fall in
+        period = cube_dates(cube) or [None]
+        if args.simpan_stok:
+            store.save_stock_snapshot({loc: cube_stock_per_location(cube, loc) for loc in LOCATIONS},
+                                      start_date=period[0], end_date=period[-1])
+        if args.excel:
+            from .export import bulk_workbook
+            from .items import ItemIndex
+
+            porsi_data = {loc: {"small": 0, "large": 0} for loc in LOCATIONS}
+            porsi_data.update(store.load_porsi())
+            workbook = bulk_workbook(cube, store.load_needs_config() or DEFAULT_NEEDS.copy(), porsi_data,
+                                     store.withdrawal_totals(start_date=period[0], end_date=period[-1]), ItemIndex(cube["items"]), store.load_synonyms())
+            path = os.path.join(args.out, f"laporan_lengkap_{datetime.now().strftime('%Y%m%d')}.xlsx")
+            with open(path, "wb") as f:
+                f.write(workbook)
+            paths.append(path)
+        store.close()
+
+    for path in paths:
+        print(f"  {path}")
+    return 1 if report["errors"] else 0
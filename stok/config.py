@@ -0,0 +1,57 @@
+# -------------------------
+# CONFIG / DEFAULTS
+# -------------------------
+LOCATIONS = ["Llagang", "Batoh", "Merduati", "Ldingin", "Cadek", "Pkn Bil", "Seutui"]
+
+# Other spellings of each kitchen seen in PDF column headers. Matching ignores case,
+# spaces and punctuation, so "PKN. BIL" or "Pkn Bil(03)" need no entry of their own.
+LOCATION_ALIASES = {
+    "Llagang": ["Lam Lagang", "Lamlagang"],
+    "Batoh": [],
+    "Merduati": [],
+    "Ldingin": ["Lam Dingin", "Lamdingin"],
+    "Cadek": [],
+    "Pkn Bil": ["Peukan Bilui", "Peukan Bileu", "Pkn Bilui"],
+    "Seutui": [],
+}
+
+# Default NEEDS_PER_PORTION with gramasi (weight/unit per portion)
+DEFAULT_NEEDS = {
+    "Asam Jawa": {"small": 0.02, "large": 0.04, "unit": "kg"},
+    "Bawang Merah": {"small": 0.05, "large": 0.1, "unit": "kg"},
+    "Bawang Putih": {"small": 0.03, "large": 0.06, "unit": "kg"},
+    "Beras": {"small": 0.1, "large": 0.2, "unit": "kg"},
+    "Bumbu Giling Putih": {"small": 0.01, "large": 0.02, "unit": "kg"},
+    "Cabe Giling Merah": {"small": 0.02, "large": 0.04, "unit": "kg"},
+    "Bumbu Giling Merah": {"small": 0.015, "large": 0.03, "unit": "kg"},
+    "Daun Pra": {"small": 0.005, "large": 0.01, "unit": "kg"},
+    "Daun Salam": {"small": 0.002, "large": 0.004, "unit": "kg"},
+    "Garam": {"small": 0.01, "large": 0.02, "unit": "kg"},
+    "Gula Merah": {"small": 0.015, "large": 0.03, "unit": "kg"},
+    "Gula Pasir": {"small": 0.01, "large": 0.02, "unit": "kg"},
+    "Kacang Panjang": {"small": 0.05, "large": 0.1, "unit": "kg"},
+    "Kentang": {"small": 0.08, "large": 0.15, "unit": "kg"},
+    "Minyak": {"small": 0.02, "large": 0.04, "unit": "kg"},
+    "Royco": {"small": 0.005, "large": 0.01, "unit": "kg"},
+    "Tahu": {"small": 0.05, "large": 0.1, "unit": "kg"},
+    "Tempe": {"small": 0.05, "large": 0.1, "unit": "kg"},
+    "Teri": {"small": 0.02, "large": 0.04, "unit": "kg"},
+    "Wortel": {"small": 0.05, "large": 0.1, "unit": "kg"},
+}
+
+TIDY_COLUMNS = ["NAMA BARANG", "Tanggal"] + LOCATIONS + ["Total", "Sumber File"]
+
+# Compact df_all: Tanggal becomes the (sorted) index, item and source file are categorical
+# and the quantities one float32 block
+FRAME_COLUMNS = [c for c in TIDY_COLUMNS if c != "Tanggal"]
+QUANTITY_COLUMNS = LOCATIONS + ["Total"]
+# Rounding float32 quantities to this many decimals when widening them recovers the values
+# printed in the PDFs (exact for quantities up to ~8000)
+QUANTITY_DECIMALS = 3
+
+# Calendar used to bucket the weekly recaps: 7-day blocks counted from the first date,
+# Monday-to-Sunday weeks, or ISO weeks (also Monday-to-Sunday, labelled by ISO week number)
+WEEK_MODES = {"relative": "Per 7 hari dari tanggal pertama", "monday": "Senin - Minggu", "iso": "Minggu ISO"}
+
+# Bump whenever parsing/normalization output changes so cached tables are re-parsed
+PARSER_VERSION = "5"
@@ -0,0 +1,147 @@
+import os
+import glob
+import shutil
+import threading
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+from .config import LOCATIONS, QUANTITY_DECIMALS
+from .items import canonical_key
+
+# -------------------------
+# DATASET SETTINGS
+# -------------------------
+# Long-history archive next to the store: one Parquet file per day and kitchen,
+#   <DATASET_DIR>/stok/hari=2025-11-24/dapur=batoh/part-0.parquet
+#   <DATASET_DIR>/penarikan/hari=.../dapur=.../part-0.parquet
+# so a period recap only opens the files of the dates it covers.
+DATASET_DIR = os.environ.get(
+    "STOK_DATASET_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "stok_dataset")
+)
+
+# Parquet needs pyarrow; queries go through DuckDB when it is installed, pyarrow.dataset otherwise
+DATASET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+DATASET_ENGINE = "duckdb" if importlib.util.find_spec("duckdb") else "pyarrow"
+
+DATASET_KINDS = ("stok", "penarikan")
+DATASET_COLUMNS = ["Tanggal", "Lokasi", "NAMA BARANG", "Jumlah", "Sumber"]
+
+# Partition values are the canonical location keys ("Pkn Bil" -> "pknbil"), which need no
+# escaping in a directory name; the display name is kept in the Lokasi column. The keys are
+# not "tanggal" / "lokasi": DuckDB matches column names case-insensitively and would let a
+# partition value override the Tanggal / Lokasi column of the files.
+PARTITION_GLOB = os.path.join("hari=*", "dapur=*", "*.parquet")
+LOCATION_KEYS = {loc: canonical_key(loc) for loc in LOCATIONS}
+
+# Sessions finishing an ingestion at the same time rewrite the same date directories;
+# writes within the server process are serialized like the store's
+_WRITE_LOCK = threading.Lock()
+
+# Prefix/aggregate sums of the rounded quantities; matches the cube's rounding
+DATASET_DECIMALS = 6
+
+# -------------------------
+# WRITING
+# -------------------------
+def stock_rows(df):
+    # Compact df_all -> long table (DATASET_COLUMNS), one row per item, kitchen and source file
+    df = df[df.index.notna()]
+    values = np.round(df[LOCATIONS].to_numpy(dtype=float), QUANTITY_DECIMALS)
+    present = ~np.isnan(values)
+    rows, cols = np.nonzero(present)
+    return pd.DataFrame({
+        "Tanggal": df.index.normalize()[rows].strftime("%Y-%m-%d"),
+        "Lokasi": np.asarray(LOCATIONS, dtype=object)[cols],
+        "NAMA BARANG": df["NAMA BARANG"].to_numpy(dtype=object)[rows],
+        "Jumlah": values[present],
+        "Sumber": df["Sumber File"].to_numpy(dtype=object)[rows],
+    })
+
+def withdrawal_rows(withdrawals):
+    # StokStore.withdrawal_daily() rows -> long table (DATASET_COLUMNS)
+    frame = pd.DataFrame(withdrawals, columns=["Lokasi", "NAMA BARANG", "Tanggal", "Jumlah"])
+    frame["Sumber"] = "penarikan"
+    return frame[DATASET_COLUMNS]
+
+def _partition_dir(root, kind, day, loc=None):
+    path = os.path.join(root, kind, f"hari={day}")
+    return path if loc is None else os.path.join(path, f"dapur={LOCATION_KEYS[loc]}")
+
+def write_partitions(rows, kind, root=DATASET_DIR, dates=None):
+    # Replace the partitions of every date in rows (plus dates, e.g. days whose files were
+    # all removed) with rows' data; other dates are left alone. Returns the files written.
+    touched = set(rows["Tanggal"]) | {str(d) for d in dates or ()}
+    written = 0
+    with _WRITE_LOCK:
+        for day in touched:
+            shutil.rmtree(_partition_dir(root, kind, day), ignore_errors=True)
+        for (day, loc), part in rows.groupby(["Tanggal", "Lokasi"], sort=True):
+            path = _partition_dir(root, kind, day, loc)
+            os.makedirs(path, exist_ok=True)
+            part.reset_index(drop=True).to_parquet(os.path.join(path, "part-0.parquet"), index=False)
+            written += 1
+    return written
+
+def dataset_dates(kind="stok", root=DATASET_DIR):
+    # Dates present in the archive, read from the directory names only
+    path = os.path.join(root, kind)
+    if not os.path.isdir(path):
+        return []
+    return sorted(pd.Timestamp(name.split("=", 1)[1]).date() for name in os.listdir(path)
+                  if name.startswith("hari="))
+
+# -------------------------
+# QUERIES
+# -------------------------
+# Both engines prune on the hari partition and only return per-item/location sums,
+# so the history itself is never loaded into pandas. Only PARTITION_GLOB is read, so
+# directories left by an older layout are ignored.
+def _sums_duckdb(path, start, end):
+    import duckdb
+
+    sql = (f"SELECT \"NAMA BARANG\", Lokasi, SUM(Jumlah) AS Jumlah "
+           f"FROM read_parquet('{os.path.join(path, PARTITION_GLOB)}', hive_partitioning = true, "
+           f"hive_types = {{'hari': VARCHAR, 'dapur': VARCHAR}}) WHERE 1=1")
+    params = []
+    if start is not None:
+        sql += " AND hari >= ?"
+        params.append(start.isoformat())
+    if end is not None:
+        sql += " AND hari <= ?"
+        params.append(end.isoformat())
+    with duckdb.connect() as conn:
+        return conn.execute(sql + " GROUP BY 1, 2", params).df()
+
+def _sums_pyarrow(path, start, end):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([("hari", pa.string()), ("dapur", pa.string())]), flavor="hive")
+    files = sorted(glob.glob(os.path.join(path, PARTITION_GLOB)))
+    dataset = ds.dataset(files, format="parquet", partitioning=partitioning, partition_base_dir=path)
+    condition = None
+    if start is not None:
+        condition = ds.field("hari") >= start.isoformat()
+    if end is not None:
+        upper = ds.field("hari") <= end.isoformat()
+        condition = upper if condition is None else condition & upper
+    table = dataset.to_table(columns=["NAMA BARANG", "Lokasi", "Jumlah"], filter=condition)
+    sums = table.group_by(["NAMA BARANG", "Lokasi"]).aggregate([("Jumlah", "sum")])
+    return sums.to_pandas().rename(columns={"Jumlah_sum": "Jumlah"})
+
+def query_rekap(kind="stok", start=None, end=None, root=DATASET_DIR, engine=DATASET_ENGINE):
+    # Recap (NAMA BARANG, locations..., Total) of the archive between start and end
+    # (inclusive, open when None), in the same layout as cube_rekap_period
+    path = os.path.join(root, kind)
+    if not os.path.isdir(path) or not dataset_dates(kind, root):
+        return pd.DataFrame()
+    sums = _sums_duckdb(path, start, end) if engine == "duckdb" else _sums_pyarrow(path, start, end)
+    if sums.empty:
+        return pd.DataFrame()
+    recap = sums.pivot_table(index="NAMA BARANG", columns="Lokasi", values="Jumlah", aggfunc="sum")
+    recap = recap.reindex(columns=LOCATIONS).fillna(0).round(DATASET_DECIMALS)
+    recap.columns.name = None
+    recap["Total"] = recap[LOCATIONS].sum(axis=1)
+    return recap.reset_index().sort_values("NAMA BARANG", ignore_index=True)
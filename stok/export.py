@@ -0,0 +1,91 @@
+import io
+import math
+import pandas as pd
+
+from .config import LOCATIONS
+from .items import match_stock
+from .needs import build_needs_cube, location_overview, needs_table, penarikan_table, portions_array
+from .recap import cube_dates, cube_rekap_day, cube_rekap_total, cube_rekap_week, cube_stock_per_location, cube_weeks
+
+# -------------------------
+# PER-LOCATION WORKBOOKS
+# -------------------------
+def kebutuhan_workbook(needs_df, current_stock):
+    out_buf = io.BytesIO()
+    with pd.ExcelWriter(out_buf, engine="xlsxwriter") as writer:
+        needs_df.to_excel(writer, sheet_name="Kebutuhan", index=False)
+
+        # Add current stock data
+        agg_stock = pd.DataFrame(list(current_stock.items()), columns=["Nama Barang", "Stok Tersedia"])
+        agg_stock.to_excel(writer, sheet_name="Stok_Saat_Ini", index=False)
+    return out_buf.getvalue()
+
+def penarikan_workbook(penarikan_df):
+    out_buf = io.BytesIO()
+    with pd.ExcelWriter(out_buf, engine="xlsxwriter") as writer:
+        penarikan_df.to_excel(writer, sheet_name="Penarikan", index=False)
+    return out_buf.getvalue()
+
+# -------------------------
+# BULK WORKBOOK
+# -------------------------
+def _cell(value):
+    # xlsxwriter cannot write NaN; leave those cells blank
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+def _write_frames(worksheet, frames):
+    # frames: iterable of (prefix_values, DataFrame); rows are written strictly top to bottom
+    # because constant_memory mode flushes each row as soon as the next one starts
+    row = 1
+    for prefix, df in frames:
+        if df.empty:
+            continue
+        for values in df.itertuples(index=False, name=None):
+            worksheet.write_row(row, 0, [_cell(v) for v in prefix + values])
+            row += 1
+
+def _add_sheet(workbook, name, header, frames, bold):
+    worksheet = workbook.add_worksheet(name)
+    worksheet.write_row(0, 0, header, bold)
+    _write_frames(worksheet, frames)
+
+def bulk_workbook(cube, needs_config, porsi_data, penarikan_data, item_index=None, synonyms=None):
+    # Every recap mode plus needs, stock and withdrawal tables for all LOCATIONS in one
+    # workbook, streamed sheet by sheet with xlsxwriter's constant_memory mode.
+    # With an ItemIndex, withdrawal stock is matched to gramasi items by canonical name.
+    import xlsxwriter
+
+    out_buf = io.BytesIO()
+    workbook = xlsxwriter.Workbook(out_buf, {"constant_memory": True})
+    bold = workbook.add_format({"bold": True})
+    rekap_cols = ["NAMA BARANG"] + LOCATIONS + ["Total"]
+
+    _add_sheet(workbook, "Rekap Total", rekap_cols, [((), cube_rekap_total(cube))], bold)
+    _add_sheet(workbook, "Rekap Harian", ["Tanggal"] + rekap_cols,
+               (((d.isoformat(),), cube_rekap_day(cube, d)) for d in cube_dates(cube)), bold)
+    _add_sheet(workbook, "Rekap Mingguan", ["Minggu"] + rekap_cols,
+               (((label,), cube_rekap_week(cube, rng)) for label, rng in cube_weeks(cube).items()), bold)
+
+    stocks = {loc: cube_stock_per_location(cube, loc) for loc in LOCATIONS}
+    matched = stocks if item_index is None else {
+        loc: match_stock(needs_config, stocks[loc], item_index, synonyms) for loc in LOCATIONS}
+    needs = build_needs_cube(needs_config, portions_array(porsi_data), matched, penarikan_data)
+    needs_frames = [((loc,), needs_table(needs, loc)) for loc in LOCATIONS]
+    penarikan_frames = [((loc,), penarikan_table(needs, loc)) for loc in LOCATIONS]
+
+    if needs_frames[0][1].empty:
+        needs_header = penarikan_header = ["Lokasi"]
+    else:
+        needs_header = ["Lokasi"] + list(needs_frames[0][1].columns)
+        penarikan_header = ["Lokasi"] + list(penarikan_frames[0][1].columns)
+    _add_sheet(workbook, "Kebutuhan", needs_header, needs_frames, bold)
+    _add_sheet(workbook, "Stok", ["Lokasi", "Nama Barang", "Stok Tersedia"],
+               (((loc,), pd.DataFrame(list(stocks[loc].items()))) for loc in LOCATIONS), bold)
+    _add_sheet(workbook, "Penarikan", penarikan_header, penarikan_frames, bold)
+    _add_sheet(workbook, "Kekurangan", ["Nama Barang", "Unit"] + LOCATIONS,
+               [((), location_overview(needs, "shortage"))], bold)
+
+    workbook.close()
+    return out_buf.getvalue()
@@ -0,0 +1,381 @@
+import io
+import os
+import shutil
+import hashlib
+import tempfile
+import zipfile
+import multiprocessing
+import numpy as np
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+from .cache import content_key
+from .config import FRAME_COLUMNS, QUANTITY_COLUMNS, TIDY_COLUMNS
+from .timing import merge_timings, stage
+from .parsing import (
+    LAYOUT_TEMPLATES,
+    count_pdf_pages,
+    detect_layout_template,
+    extract_table_rows,
+    extract_tables_from_pdf_path,
+    layout_templates_snapshot,
+    merge_layout_templates,
+    normalize_raw_table,
+    parse_date_from_filename,
+    table_rows_to_frame,
+)
+
+# -------------------------
+# PARALLEL SETTINGS
+# -------------------------
+# 0 / unset -> one worker per CPU; 1 -> parse serially in the calling process
+MAX_WORKERS = int(os.environ.get("STOK_MAX_WORKERS", "0")) or None
+# PDFs with more pages than this are split into page chunks across workers
+PAGES_PER_JOB = int(os.environ.get("STOK_PAGES_PER_JOB", "8"))
+# PDFs unpacked from ZIPs stay in memory up to this many bytes, the rest spill to temp files
+MEMORY_LIMIT = int(os.environ.get("STOK_MEMORY_LIMIT_MB", "256")) * 1024 * 1024
+
+# Streamlit runs a multi-threaded server, so never fork it: workers are spawned
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+COPY_CHUNK = 1024 * 1024
+
+# -------------------------
+# WORKER JOBS
+# -------------------------
+def _pdf_input(data):
+    # Sources are either raw bytes (kept in memory) or a path to a spilled temp file
+    if isinstance(data, (bytes, bytearray)):
+        return io.BytesIO(data)
+    return data
+
+def _parse_pdf_job(data, source_filename, templates=None):
+    # Returns (tidy table, stage timings, column mapping report, layout templates) so workers
+    # can report where their time went, how the location columns were found and which
+    # layouts they detected
+    timings = {}
+    mapping = {}
+    raw = extract_tables_from_pdf_path(_pdf_input(data), timings=timings, templates=templates)
+    with stage(timings, "normalize_raw_table"):
+        tidy = normalize_raw_table(raw, source_filename, mapping)
+    return tidy, timings, mapping, templates
+
+def _extract_rows_job(data, page_numbers, templates=None):
+    timings = {}
+    rows = extract_table_rows(_pdf_input(data), page_numbers, timings=timings, templates=templates)
+    # Columns are mapped once all chunks are stitched back together
+    return rows, timings, None, templates
+
+def _plan_jobs(data, pages_per_job, templates):
+    # One job per file, or one per page chunk when the file is large
+    if not pages_per_job:
+        return [None]
+    n_pages = count_pdf_pages(_pdf_input(data))
+    if n_pages <= pages_per_job:
+        return [None]
+    # Chunks without the header page need the template up front
+    detect_layout_template(_pdf_input(data), templates)
+    return [list(range(i, min(i + pages_per_job, n_pages))) for i in range(0, n_pages, pages_per_job)]
+
+# -------------------------
+# PDF SOURCES
+# -------------------------
+def _read_member(z, info, spill_dir, in_memory, memory_limit):
+    # Stream one ZIP member into memory, or into spill_dir once the memory budget is used up
+    digest = hashlib.sha256()
+    with z.open(info) as member:
+        if in_memory + info.file_size <= memory_limit:
+            buf = io.BytesIO()
+            while True:
+                chunk = member.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                buf.write(chunk)
+            return buf.getvalue(), digest.hexdigest()
+        fd, target = tempfile.mkstemp(dir=spill_dir(), suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = member.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+        return target, digest.hexdigest()
+
+def _collect_sources(file_bytes_list, filenames, report, memory_limit, spill_dir):
+    sources = []
+    in_memory = 0
+    for b, fname in zip(file_bytes_list, filenames):
+        lower = fname.lower()
+        if lower.endswith(".zip"):
+            try:
+                with zipfile.ZipFile(io.BytesIO(b), "r") as z:
+                    for info in z.infolist():
+                        if info.is_dir() or not info.filename.lower().endswith(".pdf"):
+                            continue
+                        data, sha = _read_member(z, info, spill_dir, in_memory, memory_limit)
+                        if not isinstance(data, str):
+                            in_memory += len(data)
+                        sources.append({"key": info.filename, "name": os.path.basename(info.filename),
+                                        "data": data, "sha256": sha})
+            except Exception as e:
+                report["warnings"].append((fname, f"Gagal mengekstrak zip {fname}: {e}"))
+        elif lower.endswith(".pdf"):
+            # Uploaded PDFs are already in memory; hand the bytes over as they are
+            sources.append({"key": fname, "name": os.path.basename(fname),
+                            "data": b, "sha256": hashlib.sha256(b).hexdigest()})
+    sources.sort(key=lambda s: s["key"])
+    return sources
+
+@contextmanager
+def open_pdf_sources(file_bytes_list, filenames, report, memory_limit=None):
+    # Yields the uploaded PDFs, ZIP members included, sorted by name. Each source is a dict
+    # with "name", "data" (bytes or spilled temp file path) and "sha256".
+    # Spilled files are removed when the block exits.
+    if memory_limit is None:
+        memory_limit = MEMORY_LIMIT
+    spill = {"dir": None}
+
+    def spill_dir():
+        if spill["dir"] is None:
+            spill["dir"] = tempfile.mkdtemp(prefix="stok_")
+        return spill["dir"]
+
+    try:
+        with stage(report.get("timings"), "read sources"):
+            sources = _collect_sources(file_bytes_list, filenames, report, memory_limit, spill_dir)
+        yield sources
+    finally:
+        if spill["dir"] is not None:
+            shutil.rmtree(spill["dir"], ignore_errors=True)
+
+# -------------------------
+# INGESTION
+# -------------------------
+def _restamp(df, source_filename):
+    if df.empty:
+        return df
+    df["Tanggal"] = parse_date_from_filename(source_filename)
+    df["Sumber File"] = source_filename
+    return df[TIDY_COLUMNS]
+
+def _lookup_cache(sources, cache, report):
+    # Split sources into cached results and the ones that still need parsing
+    cached = {}
+    keys = {}
+    for i, src in enumerate(sources):
+        key = content_key(src["sha256"])
+        df = cache.get(key)
+        if df is None:
+            keys[i] = key
+        else:
+            cached[i] = _restamp(df, src["name"])
+            _record_mapping(report, src["name"], cache.get_mapping(key))
+    report["cache_hits"] = len(cached)
+    report["cache_misses"] = len(keys)
+    return cached, keys
+
+def _record_mapping(report, name, mapping):
+    # Keep each parsed file's location column report; warn when a kitchen was not found by name
+    if not mapping:
+        return
+    report["column_mapping"][name] = mapping
+    guessed = [loc for loc, c in mapping["columns"].items() if c["method"] == "position"]
+    missing = [loc for loc, c in mapping["columns"].items() if c["method"] == "missing"]
+    if guessed:
+        report["warnings"].append((name, f"Kolom lokasi di {name} tidak dikenali, ditebak dari posisi kolom"))
+    if missing:
+        report["warnings"].append((name, f"Lokasi {', '.join(missing)} tidak ada di header {name}"))
+
+def _parse_serial(sources, indices, report, progress, deliver):
+    results = {}
+    for n, i in enumerate(indices):
+        name = sources[i]["name"]
+        try:
+            results[i], timings, mapping, _ = _parse_pdf_job(sources[i]["data"], name, LAYOUT_TEMPLATES)
+            merge_timings(report["timings"], timings)
+            _record_mapping(report, name, mapping)
+            deliver(i, results[i])
+        except Exception as e:
+            report["errors"].append((name, str(e)))
+        if progress:
+            progress(n + 1, len(indices), name)
+    return results
+
+def _parse_parallel(sources, plans, report, progress, max_workers, deliver):
+    results = {}
+    chunks = {}
+    pending = {}
+    failed = set()
+    done = 0
+    total = len(plans)
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=MP_CONTEXT) as pool:
+        futures = {}
+        # Every job gets a snapshot of the templates known so far (pickled, so a copy per job)
+        known = layout_templates_snapshot()
+        for i, plan in plans.items():
+            src = sources[i]
+            if plan == [None]:
+                futures[pool.submit(_parse_pdf_job, src["data"], src["name"], known)] = (i, None)
+            else:
+                chunks[i] = [None] * len(plan)
+                pending[i] = len(plan)
+                for k, page_numbers in enumerate(plan):
+                    futures[pool.submit(_extract_rows_job, src["data"], page_numbers, known)] = (i, k)
+
+        for fut in as_completed(futures):
+            i, k = futures[fut]
+            name = sources[i]["name"]
+            if i in failed:
+                continue
+            try:
+                res, timings, mapping, templates = fut.result()
+                merge_timings(report["timings"], timings)
+                merge_layout_templates(templates)
+            except Exception as e:
+                report["errors"].append((name, str(e)))
+                failed.add(i)
+                chunks.pop(i, None)
+                done += 1
+                if progress:
+                    progress(done, total, name)
+                continue
+            if k is None:
+                results[i] = res
+                _record_mapping(report, name, mapping)
+                deliver(i, res)
+            else:
+                chunks[i][k] = res
+                pending[i] -= 1
+                if pending[i]:
+                    continue
+                # Every page chunk is back: stitch rows in page order, normalize once
+                rows = [r for chunk in chunks.pop(i) for r in chunk]
+                try:
+                    mapping = {}
+                    with stage(report["timings"], "normalize_raw_table"):
+                        results[i] = normalize_raw_table(table_rows_to_frame(rows), name, mapping)
+                    _record_mapping(report, name, mapping)
+                    deliver(i, results[i])
+                except Exception as e:
+                    report["errors"].append((name, str(e)))
+                    failed.add(i)
+            done += 1
+            if progress:
+                progress(done, total, name)
+    return results
+
+def process_uploaded_files(file_bytes_list, filenames, max_workers=None, progress=None, pages_per_job=None,
+                           cache=None, memory_limit=None, known_sources=None, on_result=None):
+    # Returns (df_all, report); report lists per-file errors instead of aborting the run.
+    # progress(done, total, filename) is called in the calling process after each PDF.
+    # on_result(filename, sha256, tidy) streams every PDF's tidy table as soon as it is ready.
+    # With a TableCache, only PDFs whose content was not parsed before are parsed.
+    # known_sources ({file name: sha256}) skips files that are already ingested unchanged.
+    # report["timings"] holds per-stage seconds; worker stages are summed over all workers.
+    # report["column_mapping"] holds the location column report of every file, cache hits included.
+    report = {"files": [], "sources": {}, "skipped": [], "errors": [], "warnings": [],
+              "cache_hits": 0, "cache_misses": 0, "timings": {}, "column_mapping": {}}
+    timings = report["timings"]
+    if max_workers is None:
+        max_workers = MAX_WORKERS or os.cpu_count() or 1
+    if pages_per_job is None:
+        pages_per_job = PAGES_PER_JOB
+
+    with open_pdf_sources(file_bytes_list, filenames, report, memory_limit) as sources:
+        if known_sources:
+            report["skipped"] = [src["name"] for src in sources if known_sources.get(src["name"]) == src["sha256"]]
+            sources = [src for src in sources if known_sources.get(src["name"]) != src["sha256"]]
+        report["files"] = [src["name"] for src in sources]
+        report["sources"] = {src["name"]: src["sha256"] for src in sources}
+
+        def deliver(i, tidy):
+            if on_result is not None:
+                on_result(sources[i]["name"], sources[i]["sha256"], tidy)
+
+        cached, keys = {}, {}
+        to_parse = list(range(len(sources)))
+        if cache is not None:
+            with stage(timings, "cache lookup"):
+                cached, keys = _lookup_cache(sources, cache, report)
+            to_parse = list(keys)
+            for i, tidy in cached.items():
+                deliver(i, tidy)
+
+        if cache is not None:
+            # Layouts detected by earlier ingestions (and other processes) using this cache
+            merge_layout_templates(cache.load_templates())
+        with stage(timings, "parse (wall)"):
+            if max_workers == 1:
+                results = _parse_serial(sources, to_parse, report, progress, deliver)
+            else:
+                plans = {}
+                for i in to_parse:
+                    try:
+                        plans[i] = _plan_jobs(sources[i]["data"], pages_per_job, LAYOUT_TEMPLATES)
+                    except Exception as e:
+                        report["errors"].append((sources[i]["name"], str(e)))
+                if len(plans) <= 1 and all(plan == [None] for plan in plans.values()):
+                    # A single small PDF is not worth the worker start-up cost
+                    results = _parse_serial(sources, list(plans), report, progress, deliver)
+                else:
+                    results = _parse_parallel(sources, plans, report, progress, max_workers, deliver)
+    # Workers finish in any order; report errors in file order like the serial path
+    order = {name: i for i, name in enumerate(report["files"])}
+    report["errors"].sort(key=lambda e: order.get(e[0], len(order)))
+
+    with stage(timings, "cache store"):
+        for i, key in keys.items():
+            if i in results:
+                cache.put(key, results[i], report["column_mapping"].get(sources[i]["name"]))
+        if cache is not None:
+            cache.save_templates(layout_templates_snapshot())
+    results.update(cached)
+
+    combined = []
+    for i in sorted(results):
+        tidy = results[i]
+        if tidy is not None and not tidy.empty:
+            combined.append(tidy)
+
+    with stage(timings, "pd.concat"):
+        if combined:
+            tidy_all = pd.concat(combined, ignore_index=True)
+        else:
+            tidy_all = pd.DataFrame(columns=TIDY_COLUMNS)
+    with stage(timings, "compact"):
+        df_all = compact_frame(tidy_all)
+    report["memory"] = {"tidy_bytes": frame_memory(tidy_all), "compact_bytes": frame_memory(df_all)}
+    return df_all, report
+
+# -------------------------
+# COMPACT df_all
+# -------------------------
+def compact_frame(tidy):
+    # Tidy rows (Tanggal column, object/str names, mixed int/float/None quantities) ->
+    # compact df_all: sorted Tanggal index with undated rows last, categorical NAMA BARANG
+    # and Sumber File, and the quantities as a single float32 block
+    tanggal = pd.to_datetime(tidy["Tanggal"]).to_numpy()
+    order = np.argsort(tanggal, kind="stable")
+    index = pd.DatetimeIndex(tanggal[order], name="Tanggal")
+    df = pd.DataFrame(tidy[QUANTITY_COLUMNS].to_numpy(dtype=np.float32, na_value=np.nan)[order],
+                      columns=QUANTITY_COLUMNS, index=index)
+    df.insert(0, "NAMA BARANG", pd.Categorical(tidy["NAMA BARANG"].to_numpy(dtype=object)[order]))
+    df["Sumber File"] = pd.Categorical(tidy["Sumber File"].to_numpy(dtype=object)[order])
+    return df[FRAME_COLUMNS]
+
+def frame_memory(df):
+    # Bytes held by a frame, index and string contents included
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+def merge_ingested(df_all, df_new, replaced_files):
+    # Incremental ingestion: rows of replaced_files (re-uploaded under the same Sumber File,
+    # and therefore the same file-name date) are dropped from df_all, then df_new is merged in.
+    # Returns (merged, removed) so derived aggregates can be patched with just the delta.
+    mask = df_all["Sumber File"].isin(replaced_files).to_numpy()
+    removed = df_all[mask]
+    # Categories differ between the two frames; re-compacting unions them
+    merged = compact_frame(pd.concat([df_all[~mask].reset_index(), df_new.reset_index()], ignore_index=True))
+    return merged, removed
@@ -0,0 +1,78 @@
+import re
+from collections import Counter
+from difflib import SequenceMatcher
+
+# -------------------------
+# ITEM NAME NORMALIZATION
+# -------------------------
+# PDF item names differ from the gramasi names in case, spacing and punctuation
+# ("S a n t a n K a r a", "Roti rotian (\nCoklat)"); all of them share one canonical key.
+def canonical_key(name):
+    return re.sub(r"[^0-9a-z]+", "", str(name).lower())
+
+def _ngrams(key, n=3):
+    padded = f"  {key} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+class ItemIndex:
+    # Built once per ingestion from the stock item names (cube["items"]). Exact lookups go
+    # through canonical keys; a trigram index shortlists fuzzy candidates, which are only
+    # suggested and become synonyms ({item key: stock key}) once a user confirms them.
+
+    # Fuzzy candidates scoring below this SequenceMatcher ratio are not suggested
+    MIN_SCORE = 0.6
+    SHORTLIST = 20
+
+    def __init__(self, names):
+        self.names = {}
+        for name in names:
+            self.names.setdefault(canonical_key(name), []).append(name)
+        self._grams = {}
+        for key in self.names:
+            for gram in _ngrams(key):
+                self._grams.setdefault(gram, set()).add(key)
+        self._candidates = {}
+
+    def display_name(self, key):
+        return self.names[key][0]
+
+    def resolve(self, name, synonyms=None):
+        # Stock key for a gramasi item name, or None when it has no confirmed match
+        key = canonical_key(name)
+        if synonyms and key in synonyms:
+            return synonyms[key]
+        return key if key in self.names else None
+
+    def candidates(self, name, limit=3):
+        # [(stock key, score)] best first; memoized, the index never changes after ingestion
+        key = canonical_key(name)
+        if key not in self._candidates:
+            shared = Counter(k for gram in _ngrams(key) for k in self._grams.get(gram, ()))
+            scored = sorted(((SequenceMatcher(None, key, k).ratio(), k) for k, _ in shared.most_common(self.SHORTLIST)),
+                            reverse=True)
+            self._candidates[key] = [(k, round(score, 3)) for score, k in scored if score >= self.MIN_SCORE]
+        return self._candidates[key][:limit]
+
+    def stock_by_key(self, stock):
+        # {raw name: qty} -> {stock key: qty}, summing spellings that share a key
+        totals = {}
+        for name, qty in stock.items():
+            key = canonical_key(name)
+            totals[key] = totals.get(key, 0) + qty
+        return totals
+
+def match_stock(needs_config, stock, index, synonyms=None):
+    # Stock per gramasi item name ({item: qty}) for the needs / withdrawal tables
+    by_key = index.stock_by_key(stock)
+    return {item: by_key.get(index.resolve(item, synonyms), 0) for item in needs_config}
+
+def unmatched_items(needs_config, index, synonyms=None):
+    # Gramasi items without an exact stock match, with their fuzzy candidates:
+    # {item: (confirmed stock key or None, [(stock key, score)])}
+    result = {}
+    for item in needs_config:
+        key = canonical_key(item)
+        if key in index.names and not (synonyms and key in synonyms):
+            continue
+        result[item] = ((synonyms or {}).get(key), index.candidates(item))
+    return result
@@ -0,0 +1,77 @@
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from .ingest import compact_frame, process_uploaded_files
+
+# -------------------------
+# BACKGROUND INGESTION
+# -------------------------
+class IngestJob:
+    # Runs process_uploaded_files on a background thread so the UI keeps responding.
+    # The job object outlives script reruns (the app keeps it in st.session_state);
+    # progress and every finished PDF are published under a lock for the UI to poll.
+
+    def __init__(self, file_bytes_list, filenames, **kwargs):
+        self.id = uuid.uuid4().hex[:8]
+        self.status = "running"
+        self.progress = (0, 0, "")
+        self.df_new = None
+        self.report = None
+        self.error = None
+        self.seconds = None
+        self._results = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, args=(file_bytes_list, filenames, kwargs),
+                                        name=f"ingest-{self.id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self, file_bytes_list, filenames, kwargs):
+        start = time.perf_counter()
+        try:
+            df_new, report = process_uploaded_files(file_bytes_list, filenames, progress=self._on_progress,
+                                                    on_result=self._on_result, **kwargs)
+            with self._lock:
+                self.df_new, self.report = df_new, report
+                self.seconds, self.status = time.perf_counter() - start, "done"
+        except Exception as e:
+            with self._lock:
+                self.error = str(e)
+                self.seconds, self.status = time.perf_counter() - start, "error"
+
+    def _on_progress(self, done, total, name):
+        with self._lock:
+            self.progress = (done, total, name)
+
+    def _on_result(self, name, sha256, tidy):
+        with self._lock:
+            self._results.append((name, sha256, tidy))
+
+    @property
+    def running(self):
+        return self.status == "running"
+
+    def result_count(self):
+        with self._lock:
+            return len(self._results)
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def partial(self, start=0):
+        # (compact df of the PDFs finished after the first start ones, {file name: sha256}
+        # of those PDFs, number of PDFs finished so far), so a poller only handles the delta
+        with self._lock:
+            results = self._results[start:]
+        frames = [tidy for _, _, tidy in results if tidy is not None and not tidy.empty]
+        parsed = {name: sha for name, sha, _ in results}
+        end = start + len(results)
+        if not frames:
+            return None, parsed, end
+        return compact_frame(pd.concat(frames, ignore_index=True)), parsed, end
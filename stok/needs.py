@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+from .config import LOCATIONS
+
+# Gramasi units are converted to the stock's base unit before needs are compared with it
+UNIT_CONVERSIONS = {
+    "kg": ("kg", 1.0),
+    "gram": ("kg", 0.001),
+    "liter": ("liter", 1.0),
+    "ml": ("liter", 0.001),
+    "pcs": ("pcs", 1.0),
+    "butir": ("butir", 1.0),
+}
+
+# -------------------------
+# NEEDS ENGINE
+# -------------------------
+# One needs cube covers every menu item, location and planned day:
+#   need[day, item, loc] = gramasi[item, size] @ portions[day, size, loc]   (size: small, large)
+# with stock, withdrawals and shortages as (item, loc) matrices next to it. Tabs 3/4 and
+# the exports slice this cube instead of looping over needs_config per location.
+def gramasi_matrix(needs_config):
+    # (items, gramasi in base units [items x 2], base units, gramasi labels as configured).
+    # Labels keep the configured unit ("10/20 gram"); totals are in the base unit ("kg").
+    items = list(needs_config)
+    raw = np.array([[m.get("small", 0), m.get("large", 0)] for m in needs_config.values()], dtype=float)
+    units = [m.get("unit", "kg") for m in needs_config.values()]
+    base = [UNIT_CONVERSIONS.get(u, (u, 1.0)) for u in units]
+    factors = np.array([f for _, f in base])
+    labels = [f"{m.get('small', 0):g}/{m.get('large', 0):g} {u}" for m, u in zip(needs_config.values(), units)]
+    return items, raw.reshape(len(items), 2) * factors[:, None], [u for u, _ in base], labels
+
+def portions_array(porsi_data, locations=LOCATIONS):
+    # {loc: {"small", "large"}} -> portions for a single day [1 x 2 x locations]
+    return np.array([[[porsi_data.get(loc, {}).get(size, 0) for loc in locations] for size in ("small", "large")]],
+                    dtype=np.int64)
+
+def _item_matrix(items, by_location, locations):
+    # {loc: {item: qty}} -> [items x locations], missing entries are 0
+    by_location = by_location or {}
+    return np.array([[by_location.get(loc, {}).get(item, 0) for loc in locations] for item in items],
+                    dtype=float).reshape(len(items), len(locations))
+
+def build_needs_cube(needs_config, portions, stock=None, withdrawn=None, locations=LOCATIONS):
+    # portions: [days x 2 x locations]; stock / withdrawn: {loc: {gramasi item: qty}}
+    items, gramasi, units, labels = gramasi_matrix(needs_config)
+    need = np.einsum("is,dsl->dil", gramasi, portions)
+    stock_m = _item_matrix(items, stock, locations)
+    withdrawn_m = _item_matrix(items, withdrawn, locations)
+    remaining = stock_m - withdrawn_m
+    total_need = need.sum(axis=0)
+    return {
+        "items": items,
+        "units": units,
+        "labels": labels,
+        "locations": list(locations),
+        "portions": portions,
+        "need": need,
+        "total_need": total_need,
+        "stock": stock_m,
+        "withdrawn": withdrawn_m,
+        "remaining": remaining,
+        "shortage": np.maximum(total_need - remaining, 0),
+    }
+
+# -------------------------
+# NEEDS & WITHDRAWAL TABLES
+# -------------------------
+def needs_table(cube, loc):
+    k = cube["locations"].index(loc)
+    n = len(cube["items"])
+    porsi = cube["portions"][:, :, k].sum(axis=0)
+    return pd.DataFrame({
+        "No": np.arange(1, n + 1),
+        "Nama Barang": cube["items"],
+        "Gramasi": cube["labels"],
+        "Porsi Kecil": [porsi[0]] * n,
+        "Porsi Besar": [porsi[1]] * n,
+        "Total Kuantiti Barang": cube["total_need"][:, k],
+        "Unit": cube["units"],
+        "Penarikan Porsi": [""] * n,
+        "Pasarikan": [0] * n,
+    }) if n else pd.DataFrame()
+
+def penarikan_table(cube, loc):
+    k = cube["locations"].index(loc)
+    n = len(cube["items"])
+    need = cube["total_need"][:, k]
+    remaining = cube["remaining"][:, k]
+    return pd.DataFrame({
+        "No": np.arange(1, n + 1),
+        "Nama Barang": cube["items"],
+        "Stok Tersedia": cube["stock"][:, k],
+        "Kebutuhan": need,
+        "Penarikan Sebelumnya": cube["withdrawn"][:, k],
+        "Sisa Stok": remaining,
+        "Penarikan Baru": [0] * n,
+        "Status": np.where(remaining >= need, "✅ Cukup", "⚠️ Kurang"),
+    }) if n else pd.DataFrame()
+
+def location_overview(cube, key):
+    # One of the (item, loc) matrices ("total_need", "remaining", "shortage", ...) as a table
+    df = pd.DataFrame(cube[key], columns=cube["locations"])
+    df.insert(0, "Nama Barang", cube["items"])
+    df.insert(1, "Unit", cube["units"])
+    return df
+
+# -------------------------
+# GRAMASI CONFIG <-> TABLE
+# -------------------------
+def needs_config_frame(needs_config):
+    # Editable table of the gramasi config, one row per menu item
+    config_rows = []
+    for item, values in needs_config.items():
+        config_rows.append({
+            "Nama Menu": item,
+            "Gramasi Porsi Kecil": values.get("small", 0),
+            "Gramasi Porsi Besar": values.get("large", 0),
+            "Unit": values.get("unit", "kg")
+        })
+    return pd.DataFrame(config_rows)
+
+def needs_config_from_frame(config_df):
+    new_config = {}
+    for _, row in config_df.iterrows():
+        new_config[row["Nama Menu"]] = {
+            "small": float(row["Gramasi Porsi Kecil"]),
+            "large": float(row["Gramasi Porsi Besar"]),
+            "unit": row["Unit"]
+        }
+    return new_config
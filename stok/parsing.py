@@ -0,0 +1,325 @@
+import re
+import threading
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from .config import LOCATION_ALIASES, LOCATIONS, TIDY_COLUMNS
+from .items import canonical_key
+from .quantity import parse_quantities, parse_quantity
+from .timing import stage
+
+# Regex helpers
+FILE_DATE_REGEX = re.compile(r"(\d{1,2})[_\s-](\d{1,2})[_\s-](\d{2,4})")
+
+# -------------------------
+# UTIL FUNCTIONS
+# -------------------------
+def parse_date_from_filename(fname):
+    m = FILE_DATE_REGEX.search(fname)
+    if not m:
+        return None
+    day, month, year = m.groups()
+    day = int(day)
+    month = int(month)
+    year = int(year)
+    if year < 100:
+        year += 2000
+    try:
+        return datetime(year, month, day).date()
+    except:
+        return None
+
+def extract_number(cell):
+    # First quantity in a cell (see stok.quantity), int when whole, None if there is none
+    if cell is None:
+        return None
+    val = parse_quantity(str(cell))[0]
+    if np.isnan(val):
+        return None
+    if float(val).is_integer():
+        return int(val)
+    return val
+
+def count_pdf_pages(pdf_source):
+    import pdfplumber  # heavy; only loaded once a PDF is actually parsed
+    with pdfplumber.open(pdf_source) as pdf:
+        return len(pdf.pages)
+
+# -------------------------
+# LAYOUT-AWARE TABLE EXTRACTION
+# -------------------------
+# The stock table is ruled, so cells come from its drawn lines only
+TABLE_SETTINGS = {
+    "vertical_strategy": "lines",
+    "horizontal_strategy": "lines",
+    "snap_tolerance": 3,
+    "join_tolerance": 3,
+    "edge_min_length": 3,
+    "intersection_tolerance": 3,
+}
+# Pages with fewer ruling lines/rects than this cannot hold the stock table
+MIN_TABLE_RULES = 4
+CROP_MARGIN = 2
+
+# Stock table template per PDF layout (page size + generator): {"x0", "x1", "n_cols"}.
+# This is the in-process copy; ingestion loads it from / saves it to the TableCache dir
+# and hands it to every worker job, so a supplier's layout is detected only once.
+LAYOUT_TEMPLATES = {}
+MAX_LAYOUT_TEMPLATES = 64
+# Concurrent ingestions (one IngestJob thread per session) share LAYOUT_TEMPLATES: every
+# read and write holds this lock, and it is handed out / saved as a snapshot
+_TEMPLATES_LOCK = threading.Lock()
+
+def _layout_signature(pdf):
+    page = pdf.pages[0]
+    meta = pdf.metadata or {}
+    return (round(page.width), round(page.height), page.rotation, meta.get("Producer"), meta.get("Creator"))
+
+def _known_template(templates, signature):
+    with _TEMPLATES_LOCK:
+        return templates.get(signature)
+
+def _remember_template(templates, signature, template):
+    with _TEMPLATES_LOCK:
+        _add_template(templates, signature, template)
+
+def _add_template(templates, signature, template):
+    templates.pop(signature, None)
+    templates[signature] = template
+    while len(templates) > MAX_LAYOUT_TEMPLATES:
+        templates.pop(next(iter(templates)))
+
+def merge_layout_templates(templates):
+    # Add templates found elsewhere (worker jobs, the cache dir) to LAYOUT_TEMPLATES
+    with _TEMPLATES_LOCK:
+        for signature, template in templates.items():
+            _add_template(LAYOUT_TEMPLATES, signature, template)
+
+def layout_templates_snapshot():
+    # Copy of LAYOUT_TEMPLATES to pickle for workers or save, safe from concurrent updates
+    with _TEMPLATES_LOCK:
+        return dict(LAYOUT_TEMPLATES)
+
+def _page_has_table(page):
+    # Cheap pre-check on already parsed objects, before any table finding
+    return bool(page.chars) and len(page.lines) + len(page.rects) >= MIN_TABLE_RULES
+
+def _detect_template(page):
+    # The stock table is the one with a NAMA BARANG cell; returns (template, [its rows])
+    for table in page.find_tables(TABLE_SETTINGS):
+        rows = table.extract()
+        if any(cell and "NAMA BARANG" in str(cell).upper() for row in rows for cell in row):
+            x0, _, x1, _ = table.bbox
+            return {"x0": x0, "x1": x1, "n_cols": max(len(r) for r in rows)}, [rows]
+    return None, []
+
+def _template_tables(page, template):
+    # Crop to the stock table's columns (it grows downwards, so keep the full height) and
+    # drop headings / signature blocks that do not have its column count
+    x0, top, x1, bottom = page.bbox
+    cropped = page.crop((max(template["x0"] - CROP_MARGIN, x0), top, min(template["x1"] + CROP_MARGIN, x1), bottom))
+    return [tbl for tbl in cropped.extract_tables(TABLE_SETTINGS) if tbl and len(tbl[0]) == template["n_cols"]]
+
+def detect_layout_template(pdf_source, templates):
+    # Make sure templates has this PDF's layout, detecting it on the first table page if
+    # needed. Run before a PDF is split into page chunks: most chunks lack the header page
+    # and could not detect the template themselves.
+    import pdfplumber  # heavy; only loaded once a PDF is actually parsed
+    with pdfplumber.open(pdf_source) as pdf:
+        if not pdf.pages:
+            return
+        signature = _layout_signature(pdf)
+        if _known_template(templates, signature) is not None:
+            return
+        for page in pdf.pages:
+            if _page_has_table(page):
+                found, _ = _detect_template(page)
+                if found is not None:
+                    _remember_template(templates, signature, found)
+                    return
+
+def extract_table_rows(pdf_source, page_numbers=None, timings=None, templates=None):
+    # page_numbers are 0-based indices; None reads every page.
+    # templates ({layout signature: template}, default LAYOUT_TEMPLATES) is used and extended.
+    import pdfplumber  # heavy; only loaded once a PDF is actually parsed
+    if templates is None:
+        templates = LAYOUT_TEMPLATES
+    rows = []
+    with stage(timings, "pdfplumber.open"):
+        pdf = pdfplumber.open(pdf_source)
+    with pdf:
+        with stage(timings, "extract_tables"):
+            pages = pdf.pages if page_numbers is None else [pdf.pages[i] for i in page_numbers]
+            signature = _layout_signature(pdf) if pdf.pages else None
+            template = _known_template(templates, signature)
+            confirmed = False
+            for page in pages:
+                if not _page_has_table(page):
+                    continue
+                tables = _template_tables(page, template) if template is not None else []
+                if tables:
+                    confirmed = True
+                elif not confirmed:
+                    # No template yet, or the known one does not fit this file: detect it
+                    found, tables = _detect_template(page)
+                    if found is not None:
+                        template = found
+                        confirmed = True
+                        _remember_template(templates, signature, template)
+                    else:
+                        # e.g. a page chunk without the header page of an unknown layout
+                        tables = page.extract_tables(TABLE_SETTINGS)
+                for tbl in tables:
+                    rows.extend(tbl)
+    return rows
+
+def table_rows_to_frame(rows):
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows)
+    df = df.dropna(how="all")
+    return df
+
+def extract_tables_from_pdf_path(pdf_path, timings=None, templates=None):
+    return table_rows_to_frame(extract_table_rows(pdf_path, timings=timings, templates=templates))
+
+def _find_header_row(df_raw):
+    # Label of the first row with a cell mentioning NAMA BARANG, scanned in one string pass
+    cells = pd.Series(df_raw.to_numpy(dtype=object).ravel()).astype(str)
+    hits = cells.str.upper().str.contains("NAMA BARANG", regex=False, na=False).to_numpy()
+    if not hits.any():
+        return 0
+    return df_raw.index[hits.argmax() // df_raw.shape[1]]
+
+def parse_number_column(col):
+    # Column-wise extract_number through the bulk quantity parser, NaN if no number
+    return pd.Series(parse_quantities(col.to_numpy(dtype=object))[0], index=col.index)
+
+# -------------------------
+# LOCATION COLUMN MAPPING
+# -------------------------
+# Built once: normalized alias -> location, and one regex matching any of them
+# (longest first, so "pknbilui" wins over "pknbil")
+ALIAS_INDEX = {canonical_key(alias): loc for loc in LOCATIONS for alias in [loc] + LOCATION_ALIASES.get(loc, [])}
+ALIAS_REGEX = re.compile("|".join(re.escape(k) for k in sorted(ALIAS_INDEX, key=len, reverse=True)))
+QTY_HEADER_REGEX = re.compile(r"^(qty|jumlah|jml|kuantitas)")
+MAX_HEADER_ROWS = 3
+
+def _header_block(df_raw, header_idx):
+    # The NAMA BARANG row plus the sub-header rows below it (no item name yet, e.g. the
+    # "qty / Unit" row under merged kitchen headers), as tuples of strings
+    rows = []
+    for k in range(header_idx, min(header_idx + MAX_HEADER_ROWS, len(df_raw))):
+        values = df_raw.iloc[k].tolist()
+        if k > header_idx and df_raw.shape[1] > 1 and not pd.isna(values[1]) and str(values[1]).strip():
+            break
+        rows.append(tuple("" if pd.isna(v) else str(v) for v in values))
+    return tuple(rows)
+
+@lru_cache(maxsize=256)
+def _map_location_columns(header_rows):
+    # ((location, (column, matched header text)), ...) for one header signature. The first
+    # cell (row by row, left to right) naming a kitchen wins; if a sub-header row has a
+    # qty cell under that kitchen's merged header, the quantity is read from there.
+    found = {}
+    for r, row in enumerate(header_rows):
+        for j, cell in enumerate(row):
+            m = ALIAS_REGEX.search(canonical_key(cell)) if cell else None
+            if m and ALIAS_INDEX[m.group()] not in found:
+                found[ALIAS_INDEX[m.group()]] = (r, j, cell.strip())
+    starts = sorted(j for _, j, _ in found.values())
+    mapping = []
+    for loc in LOCATIONS:
+        if loc not in found:
+            continue
+        r, j, text = found[loc]
+        end = next((s for s in starts if s > j), len(header_rows[r]))
+        qty = [c for row in header_rows[r + 1:] for c in range(j, end) if QTY_HEADER_REGEX.match(canonical_key(row[c]))]
+        mapping.append((loc, (qty[0] if qty else j, text)))
+    return tuple(mapping)
+
+def _mapping_report(mapping, location_cols):
+    # Per-file confidence: share of kitchens found by name; the rest are either guessed
+    # by position (no kitchen header at all) or missing from the PDF
+    columns = {}
+    for loc in LOCATIONS:
+        if loc in mapping:
+            columns[loc] = {"column": mapping[loc][0], "header": mapping[loc][1], "method": "alias"}
+        elif loc in location_cols:
+            columns[loc] = {"column": int(location_cols[loc][4:]), "header": None, "method": "position"}
+        else:
+            columns[loc] = {"column": None, "header": None, "method": "missing"}
+    return {"confidence": len(mapping) / len(LOCATIONS), "columns": columns}
+
+def normalize_raw_table(df_raw, source_filename, mapping_report=None):
+    # mapping_report, when a dict is given, receives how each location column was found
+    if df_raw.empty:
+        return pd.DataFrame()
+
+    header_idx = _find_header_row(df_raw)
+
+    df = df_raw.iloc[header_idx+1:].reset_index(drop=True)
+    num_cols = df.shape[1]
+    colnames = []
+    for i in range(num_cols):
+        if i == 0:
+            colnames.append("NO")
+        elif i == 1:
+            colnames.append("NAMA BARANG")
+        else:
+            colnames.append(f"COL_{i}")
+    df.columns = colnames
+
+    header_rows = _header_block(df_raw, header_idx)
+    mapping = dict(_map_location_columns(header_rows)) if header_rows else {}
+    location_cols = {loc: colnames[j] for loc, (j, _) in mapping.items()}
+    if not location_cols:
+        # Header without any known kitchen name: last resort, assign columns by position
+        candidate_cols = [c for c in colnames if c.startswith("COL_")]
+        location_cols = dict(zip(LOCATIONS, candidate_cols))
+    if mapping_report is not None:
+        mapping_report.update(_mapping_report(mapping, location_cols))
+
+    if "NAMA BARANG" in df.columns:
+        names = df["NAMA BARANG"].astype(str).str.strip().fillna("nan")
+    else:
+        names = pd.Series("", index=df.index)
+    keep = (~names.str.lower().isin(["", "nan", "no", "nama barang"])).to_numpy()
+
+    n_rows = int(keep.sum())
+    tidy = {"NAMA BARANG": names.to_numpy()[keep], "Tanggal": [parse_date_from_filename(source_filename)] * n_rows}
+
+    # Parse every mapped location column in a single string pass, then split it back per column
+    cols = list(dict.fromkeys(location_cols.values()))
+    parsed = {}
+    if cols:
+        block = df[cols].to_numpy(dtype=object)[keep]
+        flat = parse_number_column(pd.Series(block.ravel(order="F"))).to_numpy(dtype=float)
+        block = np.nan_to_num(flat, nan=0.0).reshape((n_rows, len(cols)), order="F")
+        parsed = {col: block[:, k] for k, col in enumerate(cols)}
+
+    total = np.zeros(n_rows)
+    any_val = np.zeros(n_rows, dtype=bool)
+    for loc, col in location_cols.items():
+        vals = parsed[col]
+        # extract_number returned ints for whole numbers; keep int columns where it would have
+        tidy[loc] = vals.astype(np.int64) if np.all(vals == np.floor(vals)) else vals
+        # Accumulate in the same location order as the row-wise version for identical floats
+        total = total + vals
+        any_val |= vals != 0
+    if location_cols:
+        tidy["Total"] = np.where(any_val, total, np.nan)
+        # Kitchens missing from this PDF's header have no quantities, not shifted ones
+        for loc in LOCATIONS:
+            if loc not in location_cols:
+                tidy[loc] = np.full(n_rows, np.nan)
+    tidy["Sumber File"] = [source_filename] * n_rows
+    tidy_df = pd.DataFrame(tidy)
+
+    for c in TIDY_COLUMNS:
+        if c not in tidy_df.columns:
+            tidy_df[c] = None
+    tidy_df = tidy_df[TIDY_COLUMNS]
+    return tidy_df
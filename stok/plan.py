@@ -0,0 +1,133 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from .config import LOCATIONS
+from .items import canonical_key
+from .needs import gramasi_matrix
+from .parsing import ALIAS_INDEX
+
+PLAN_COLUMNS = ["Tanggal", "Lokasi", "Porsi Kecil", "Porsi Besar"]
+
+# Accepted spellings of the plan file headers (compared by canonical key)
+PLAN_HEADER_ALIASES = {
+    "Tanggal": ["tanggal", "tgl", "date"],
+    "Lokasi": ["lokasi", "dapur", "location"],
+    "Porsi Kecil": ["porsikecil", "kecil", "small"],
+    "Porsi Besar": ["porsibesar", "besar", "large"],
+}
+
+# -------------------------
+# PORTION PLAN IMPORT
+# -------------------------
+def read_portion_plan(data, filename):
+    # CSV/Excel bytes with one row per date and location -> plan table (PLAN_COLUMNS).
+    # Raises ValueError with a message for the UI when the file cannot be used.
+    if filename.lower().endswith((".xlsx", ".xls")):
+        raw = pd.read_excel(io.BytesIO(data))
+    else:
+        raw = pd.read_csv(io.BytesIO(data), sep=None, engine="python")
+
+    headers = {canonical_key(c): c for c in raw.columns}
+    rename = {}
+    for column, aliases in PLAN_HEADER_ALIASES.items():
+        found = next((headers[a] for a in aliases if a in headers), None)
+        if found is None:
+            raise ValueError(f"Kolom '{column}' tidak ditemukan di {filename}")
+        rename[found] = column
+    plan = raw.rename(columns=rename)[PLAN_COLUMNS].dropna(how="all")
+
+    locations = plan["Lokasi"].map(lambda v: ALIAS_INDEX.get(canonical_key(v)))
+    unknown = sorted(set(plan.loc[locations.isna(), "Lokasi"].astype(str)))
+    if unknown:
+        raise ValueError(f"Lokasi tidak dikenal di {filename}: {', '.join(unknown)}")
+    # ISO dates (and Excel date cells) first, strictly: dayfirst would read 2025-12-05 as
+    # May 12th. Only the rest (05/12/2025) is read day first.
+    dates = pd.to_datetime(plan["Tanggal"], format="ISO8601", errors="coerce")
+    rest = dates.isna() & plan["Tanggal"].notna()
+    if rest.any():
+        dates[rest] = pd.to_datetime(plan.loc[rest, "Tanggal"].astype(str), dayfirst=True, format="mixed", errors="coerce")
+    if dates.isna().any():
+        raise ValueError(f"Tanggal tidak valid di {filename} (baris {', '.join(str(i + 2) for i in plan.index[dates.isna()])})")
+
+    plan = pd.DataFrame({
+        "Tanggal": dates.dt.date,
+        "Lokasi": locations,
+        "Porsi Kecil": pd.to_numeric(plan["Porsi Kecil"], errors="coerce").fillna(0).astype(int),
+        "Porsi Besar": pd.to_numeric(plan["Porsi Besar"], errors="coerce").fillna(0).astype(int),
+    })
+    # A date/location listed twice keeps its last row, like re-saving it would
+    return plan.drop_duplicates(["Tanggal", "Lokasi"], keep="last").sort_values(["Tanggal", "Lokasi"], ignore_index=True)
+
+def plan_frame(rows):
+    # StokStore.load_portion_plan() rows -> plan table
+    plan = pd.DataFrame(rows, columns=PLAN_COLUMNS)
+    plan["Tanggal"] = pd.to_datetime(plan["Tanggal"]).dt.date
+    return plan
+
+# -------------------------
+# SHORTAGE FORECAST
+# -------------------------
+# Walks the daily stock timeline as arrays over [days x gramasi items x locations]:
+#   balance = cumsum(received - withdrawn - planned needs)
+# and reports, per item and location, the first day the balance drops below zero.
+def _day_positions(days, values):
+    return (np.asarray(values, dtype="datetime64[D]") - days[0]).astype(np.int64)
+
+def _received(cube, items, item_index, synonyms, days):
+    # Daily stock from the rekap cube, pooled per gramasi item through the item index
+    keys = [item_index.resolve(item, synonyms) for item in items]
+    cube_keys = [canonical_key(name) for name in cube["items"]]
+    select = np.array([[k is not None and ck == k for k in keys] for ck in cube_keys], dtype=float)
+    received = np.zeros((len(days), len(items), cube["daily"].shape[2]))
+    if len(cube["dates"]) and select.size:
+        received[_day_positions(days, cube["dates"])] = np.einsum("dcl,ci->dil", cube["daily"], select)
+    return received
+
+def forecast_shortages(cube, needs_config, plan, withdrawals, item_index, synonyms=None, locations=LOCATIONS):
+    # plan: plan table; withdrawals: StokStore.withdrawal_daily() rows.
+    # Returns {"days", "items", "balance"} plus "shortages", a table of the first shortage
+    # date per item and location (empty when the plan never runs out of stock).
+    items, gramasi, units, _ = gramasi_matrix(needs_config)
+    withdrawals = [w for w in withdrawals if w[1] in needs_config and w[0] in locations]
+    known = [np.asarray(cube["dates"], dtype="datetime64[D]"),
+             np.asarray(list(plan["Tanggal"]), dtype="datetime64[D]"),
+             np.asarray([w[2] for w in withdrawals], dtype="datetime64[D]")]
+    known = np.concatenate(known)
+    empty = pd.DataFrame(columns=["Tanggal", "Lokasi", "Nama Barang", "Kekurangan", "Unit"])
+    if not len(known) or not items:
+        return {"days": known[:0], "items": items, "balance": None, "shortages": empty}
+    days = np.arange(known.min(), known.max() + np.timedelta64(1, "D"))
+    loc_pos = {loc: k for k, loc in enumerate(locations)}
+    item_pos = {item: i for i, item in enumerate(items)}
+
+    portions = np.zeros((len(days), 2, len(locations)), dtype=np.int64)
+    if len(plan):
+        d = _day_positions(days, list(plan["Tanggal"]))
+        k = plan["Lokasi"].map(loc_pos).to_numpy()
+        portions[d, 0, k] = plan["Porsi Kecil"].to_numpy()
+        portions[d, 1, k] = plan["Porsi Besar"].to_numpy()
+
+    withdrawn = np.zeros((len(days), len(items), len(locations)))
+    if withdrawals:
+        loc, item, date, qty = zip(*withdrawals)
+        np.add.at(withdrawn, (_day_positions(days, date), [item_pos[i] for i in item], [loc_pos[l] for l in loc]),
+                  np.asarray(qty, dtype=float))
+
+    need = np.einsum("is,dsl->dil", gramasi, portions)
+    received = _received(cube, items, item_index, synonyms, days)
+    balance = np.cumsum(received - withdrawn - need, axis=0)
+
+    short = balance < -1e-9
+    first = short.argmax(axis=0)
+    i, k = np.nonzero(short.any(axis=0))
+    shortages = pd.DataFrame({
+        "Tanggal": [d.item() for d in days[first[i, k]]],
+        "Lokasi": [locations[x] for x in k],
+        "Nama Barang": [items[x] for x in i],
+        "Kekurangan": -balance[first[i, k], i, k],
+        "Unit": [units[x] for x in i],
+    }) if len(i) else empty
+    shortages = shortages.sort_values(["Tanggal", "Lokasi", "Nama Barang"], ignore_index=True)
+    return {"days": days, "items": items, "balance": balance, "shortages": shortages}
@@ -0,0 +1,87 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .needs import UNIT_CONVERSIONS
+
+# -------------------------
+# QUANTITY PARSING
+# -------------------------
+# Quantities are written the Indonesian way: "." groups thousands and "," is the decimal
+# mark ("1.250,5"). A single "." followed by anything other than exactly three digits is
+# still read as a decimal point ("2.5", "0.75"), as exported spreadsheets write them.
+# Fractions ("1/2", "1 1/2", "½"), products ("2 x 5 kg") and unit suffixes are understood;
+# amounts with a unit are converted to the base units of needs_config (kg, liter, pcs, butir).
+QUANTITY_REGEX = re.compile(r"""
+    (?:
+        (?:(?P<whole>\d+)\s+)?(?P<num>\d+)\s*/\s*(?P<den>\d+)   # 1/2, 1 1/2
+      | (?P<number>\d+(?:[.,]\d+)*)(?P<vulgar>[½¼¾])?         # 1.250,5 / 1½
+      | (?P<lone>[½¼¾])                                       # ½
+    )
+    (?:\s*[x×*]\s*(?P<factor>\d+(?:[.,]\d+)*))?               # 2 x 5
+    (?:\s*(?P<unit>[^\W\d_]+)\b)?                             # kg, gr, ltr, ...
+""", re.VERBOSE)
+THOUSANDS_REGEX = re.compile(r"[1-9]\d{0,2}\.\d{3}")
+VULGAR_FRACTIONS = {"½": 0.5, "¼": 0.25, "¾": 0.75}
+
+# Spellings seen in the PDFs -> gramasi unit (UNIT_CONVERSIONS then gives the base unit)
+UNIT_ALIASES = {
+    "kg": "kg", "kilo": "kg", "kilogram": "kg",
+    "g": "gram", "gr": "gram", "grm": "gram", "gram": "gram",
+    "l": "liter", "lt": "liter", "ltr": "liter", "liter": "liter", "litre": "liter",
+    "ml": "ml",
+    "pc": "pcs", "pcs": "pcs", "bh": "pcs", "buah": "pcs",
+    "btr": "butir", "butir": "butir",
+}
+
+# Distinct cell strings remembered by parse_quantity; the same values repeat across days
+# and kitchens, so a batch of PDFs only parses a few thousand of them
+QUANTITY_MEMO_SIZE = 1 << 16
+
+def _decimal(token):
+    if "," in token and "." in token:
+        # Whichever separator comes last is the decimal mark
+        if token.rfind(",") > token.rfind("."):
+            token = token.replace(".", "").replace(",", ".")
+        else:
+            token = token.replace(",", "")
+    elif "," in token:
+        token = token.replace(",", ".") if token.count(",") == 1 else token.replace(",", "")
+    elif token.count(".") > 1 or THOUSANDS_REGEX.fullmatch(token):
+        token = token.replace(".", "")
+    return float(token)
+
+@lru_cache(maxsize=QUANTITY_MEMO_SIZE)
+def parse_quantity(text):
+    # First quantity in a cell string -> (amount, base unit); (nan, None) when there is
+    # none, and unit None for a plain number or an unknown suffix (amount kept as written)
+    m = QUANTITY_REGEX.search(text)
+    if not m:
+        return np.nan, None
+    if m["den"] is not None:
+        den = int(m["den"])
+        amount = int(m["whole"] or 0) + int(m["num"]) / den if den else np.nan
+    elif m["number"] is not None:
+        amount = _decimal(m["number"]) + VULGAR_FRACTIONS.get(m["vulgar"], 0.0)
+    else:
+        amount = VULGAR_FRACTIONS[m["lone"]]
+    if m["factor"] is not None:
+        amount *= _decimal(m["factor"])
+    unit = UNIT_ALIASES.get((m["unit"] or "").lower())
+    if unit is None:
+        return amount, None
+    base, factor = UNIT_CONVERSIONS[unit]
+    return amount * factor, base
+
+def parse_quantities(cells):
+    # Bulk parse_quantity: array-like of cells -> (amounts, units) arrays of the same shape.
+    # Each distinct cell is parsed once; empty cells give nan / None.
+    cells = np.asarray(cells, dtype=object)
+    codes, uniques = pd.factorize(cells.ravel())
+    parsed = [parse_quantity(str(cell)) for cell in uniques]
+    # Code -1 (missing cell) picks the trailing nan / None
+    amounts = np.array([a for a, _ in parsed] + [np.nan], dtype=float)
+    units = np.array([u for _, u in parsed] + [None], dtype=object)
+    return amounts[codes].reshape(cells.shape), units[codes].reshape(cells.shape)
@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+
+from .config import LOCATIONS, QUANTITY_DECIMALS
+
+# Prefix sums turn exact per-row sums into differences; round away the float noise
+CUBE_DECIMALS = 6
+
+# -------------------------
+# RECAP FUNCTIONS
+# -------------------------
+# df is the compact df_all: Tanggal index, float32 quantities
+def _days(df):
+    return df.index.normalize()
+
+def _aggregate(df_f):
+    # Per-item sums in float64, widening the float32 quantities the same way as the cube
+    values = df_f[LOCATIONS].astype(float).round(QUANTITY_DECIMALS)
+    agg = values.groupby(df_f["NAMA BARANG"].to_numpy(dtype=object)).sum(min_count=1).fillna(0)
+    agg.index.name = "NAMA BARANG"
+    agg["Total"] = agg.sum(axis=1)
+    return agg.reset_index().sort_values("NAMA BARANG")
+
+def rekap_per_day(df, date):
+    df_f = df[_days(df) == pd.Timestamp(date)]
+    if df_f.empty:
+        return pd.DataFrame()
+    return _aggregate(df_f)
+
+def rekap_per_period(df, start_date, end_date):
+    days = _days(df)
+    mask = (days >= pd.Timestamp(start_date)) & (days <= pd.Timestamp(end_date))
+    df_f = df[mask]
+    if df_f.empty:
+        return pd.DataFrame()
+    return _aggregate(df_f)
+
+def rekap_per_week(df, mode="relative"):
+    # {week label: recap} for every week, from one groupby over (week, item)
+    df = df[df.index.notna()]
+    if df.empty:
+        return {}
+    days = df.index.to_numpy(dtype="datetime64[D]")
+    keys, weeks = _week_keys(days, mode)
+    values = df[LOCATIONS].astype(float).round(QUANTITY_DECIMALS)
+    agg = values.groupby([keys, df["NAMA BARANG"].to_numpy(dtype=object)]).sum(min_count=1).fillna(0)
+    agg.index.names = ["week", "NAMA BARANG"]
+    agg["Total"] = agg.sum(axis=1)
+    return {weeks[w][0]: group.droplevel("week").reset_index() for w, group in agg.groupby(level="week")}
+
+# -------------------------
+# WEEK BUCKETS
+# -------------------------
+# Vectorized over datetime64[D] arrays; 1970-01-01 (day 0) was a Thursday, so
+# (day + 3) % 7 is the weekday counted from Monday.
+def _week_starts(days, mode):
+    if mode == "relative":
+        return days.min() + (days - days.min()) // 7 * 7
+    if mode in ("monday", "iso"):
+        return days - (days.astype(np.int64) + 3) % 7
+    raise ValueError(f"Unknown week mode: {mode!r}")
+
+def _week_label(n, week_start, start, end, mode):
+    if mode == "iso":
+        year, week, _ = week_start.item().isocalendar()
+        return f"Minggu {week:02d}/{year} ({start} - {end})"
+    return f"Minggu {n} ({start} - {end})"
+
+def _week_keys(days, mode):
+    # Week start of every day plus {week start: (label, first date, last date)}, with the
+    # first and last date actually present in each week
+    present = np.unique(days)
+    unique, first = np.unique(_week_starts(present, mode), return_index=True)
+    last = np.append(first[1:], len(present)) - 1
+    weeks = {}
+    for w, f, l in zip(unique, first, last):
+        # Numbered from the first week, so weeks without data keep their number
+        n = int((w - unique[0]) // np.timedelta64(7, "D")) + 1
+        start, end = present[f].item(), present[l].item()
+        weeks[w] = (_week_label(n, w, start, end, mode), start, end)
+    return _week_starts(days, mode), weeks
+
+# -------------------------
+# DAILY CUBE
+# -------------------------
+# Built once per ingestion: date x NAMA BARANG x location sums with prefix sums over
+# dates, so any day/week/period recap is a difference of two slices (O(items)).
+def _cube_codes(df, items, dates):
+    # Positions of each row in the (sorted) item / date axes; undated rows get -1
+    item_codes = np.searchsorted(items.astype(str), df["NAMA BARANG"].to_numpy(dtype=str))
+    days = df.index.to_numpy(dtype="datetime64[D]")
+    dated = ~np.isnat(days)
+    date_codes = np.full(len(df), -1)
+    date_codes[dated] = np.searchsorted(dates, days[dated])
+    # Widen the float32 quantities back to the values printed in the PDFs
+    values = np.round(np.nan_to_num(df[LOCATIONS].to_numpy(dtype=float), nan=0.0), QUANTITY_DECIMALS)
+    return item_codes, date_codes, dated, values
+
+def _accumulate(cube, df, sign):
+    item_codes, date_codes, dated, values = _cube_codes(df, cube["items"], cube["dates"])
+    np.add.at(cube["daily"], (date_codes[dated], item_codes[dated]), sign * values[dated])
+    np.add.at(cube["daily_count"], (date_codes[dated], item_codes[dated]), sign)
+    np.add.at(cube["total"], item_codes, sign * values)
+    np.add.at(cube["total_count"], item_codes, sign)
+
+def _refresh_prefix(cube):
+    n_dates, n_items, n_locs = cube["daily"].shape
+    cube["prefix"] = np.zeros((n_dates + 1, n_items, n_locs))
+    np.cumsum(cube["daily"], axis=0, out=cube["prefix"][1:])
+    cube["count_prefix"] = np.zeros((n_dates + 1, n_items), dtype=np.int64)
+    np.cumsum(cube["daily_count"], axis=0, out=cube["count_prefix"][1:])
+    return cube
+
+def _empty_cube(items, dates):
+    n_dates, n_items, n_locs = len(dates), len(items), len(LOCATIONS)
+    return {
+        "dates": dates,
+        "items": items,
+        "daily": np.zeros((n_dates, n_items, n_locs)),
+        "daily_count": np.zeros((n_dates, n_items), dtype=np.int64),
+        # Rows without a date in their file name only show up in the overall total
+        "total": np.zeros((n_items, n_locs)),
+        "total_count": np.zeros(n_items, dtype=np.int64),
+    }
+
+def _cube_axes(df):
+    items = np.array(sorted(set(df["NAMA BARANG"])), dtype=object)
+    days = df.index.to_numpy(dtype="datetime64[D]")
+    dates = np.unique(days[~np.isnat(days)])
+    return items, dates
+
+def build_daily_cube(df):
+    items, dates = _cube_axes(df)
+    cube = _empty_cube(items, dates)
+    _accumulate(cube, df, 1)
+    return _refresh_prefix(cube)
+
+def copy_daily_cube(cube):
+    # update_daily_cube patches its cube in place; copy one that must stay unchanged
+    return {key: value.copy() for key, value in cube.items()}
+
+def update_daily_cube(cube, removed, added):
+    # Patch an existing cube with the rows of replaced files (removed) and newly parsed
+    # files (added) instead of rebuilding it from the whole history
+    new_items, new_dates = _cube_axes(added)
+    items = np.array(sorted(set(cube["items"]) | set(new_items)), dtype=object)
+    dates = np.union1d(cube["dates"], new_dates)
+    if len(items) != len(cube["items"]) or len(dates) != len(cube["dates"]):
+        grown = _empty_cube(items, dates)
+        item_pos = np.searchsorted(items, cube["items"])
+        date_pos = np.searchsorted(dates, cube["dates"])
+        grown["daily"][np.ix_(date_pos, item_pos)] = cube["daily"]
+        grown["daily_count"][np.ix_(date_pos, item_pos)] = cube["daily_count"]
+        grown["total"][item_pos] = cube["total"]
+        grown["total_count"][item_pos] = cube["total_count"]
+        cube = grown
+    if not removed.empty:
+        _accumulate(cube, removed, -1)
+    if not added.empty:
+        _accumulate(cube, added, 1)
+    return _refresh_prefix(cube)
+
+def cube_dates(cube):
+    return [d.item() for d in cube["dates"]]
+
+def _cube_frame(cube, values, counts):
+    present = counts > 0
+    if not present.any():
+        return pd.DataFrame()
+    agg = pd.DataFrame(np.round(values[present], CUBE_DECIMALS), columns=LOCATIONS)
+    agg.insert(0, "NAMA BARANG", cube["items"][present])
+    agg["Total"] = agg[LOCATIONS].sum(axis=1)
+    return agg
+
+def cube_rekap_period(cube, start_date, end_date):
+    dates = cube["dates"]
+    i = np.searchsorted(dates, np.datetime64(start_date, "D"), side="left")
+    j = np.searchsorted(dates, np.datetime64(end_date, "D"), side="right")
+    if j <= i:
+        return pd.DataFrame()
+    values = cube["prefix"][j] - cube["prefix"][i]
+    counts = cube["count_prefix"][j] - cube["count_prefix"][i]
+    return _cube_frame(cube, values, counts)
+
+def cube_rekap_day(cube, date):
+    return cube_rekap_period(cube, date, date)
+
+def cube_rekap_total(cube):
+    return _cube_frame(cube, cube["total"], cube["total_count"])
+
+def cube_weeks(cube, mode="relative"):
+    # Week labels keyed to (start, end) of the dates present; only the week picked
+    # afterwards is recapped (cube_rekap_week)
+    dates = cube["dates"]
+    if len(dates) == 0:
+        return {}
+    _, weeks = _week_keys(dates, mode)
+    return {label: (start, end) for label, start, end in weeks.values()}
+
+def cube_rekap_week(cube, week_range):
+    start, end = week_range
+    return cube_rekap_period(cube, start, end)
+
+def cube_stock_per_location(cube, loc):
+    # Same as df.groupby("NAMA BARANG")[loc].sum() over all rows, read from the cube
+    k = LOCATIONS.index(loc)
+    values = np.round(cube["total"][:, k], CUBE_DECIMALS)
+    return dict(zip(cube["items"], values.tolist()))
@@ -0,0 +1,266 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from .items import canonical_key
+
+# -------------------------
+# STORE SETTINGS
+# -------------------------
+DB_PATH = os.environ.get(
+    "STOK_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "stok.db")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS penarikan (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    location TEXT NOT NULL,
+    item TEXT NOT NULL,
+    date TEXT NOT NULL,
+    qty REAL NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_penarikan_loc_item_date ON penarikan (location, item, date);
+
+CREATE TABLE IF NOT EXISTS porsi (
+    location TEXT PRIMARY KEY,
+    small INTEGER NOT NULL,
+    large INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS porsi_plan (
+    date TEXT NOT NULL,
+    location TEXT NOT NULL,
+    small INTEGER NOT NULL,
+    large INTEGER NOT NULL,
+    PRIMARY KEY (date, location)
+);
+
+CREATE TABLE IF NOT EXISTS needs_config (
+    item TEXT PRIMARY KEY,
+    small REAL NOT NULL,
+    large REAL NOT NULL,
+    unit TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS item_synonyms (
+    item_key TEXT PRIMARY KEY,
+    stock_key TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS stock_snapshot (
+    location TEXT NOT NULL,
+    item TEXT NOT NULL,
+    qty REAL NOT NULL,
+    PRIMARY KEY (location, item)
+);
+
+CREATE TABLE IF NOT EXISTS stock_snapshot_range (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL
+);
+"""
+
+class StokStore:
+    # SQLite (WAL) persistence shared by every session. penarikan is an append-only
+    # ledger; porsi, needs_config and stock_snapshot hold the latest state.
+    # One connection is reused across reruns and threads, serialized by a lock.
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Snapshot rows carry PDF item names, ledger rows gramasi names; both are joined
+        # on canonical_key (plus the confirmed synonyms) inside SQL
+        self._conn.create_function("canonical_key", 1, canonical_key, deterministic=True)
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _write(self, statements):
+        # statements: list of (sql, rows) run with executemany inside one transaction
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, rows in statements:
+                    self._conn.executemany(sql, rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # ---- withdrawals ----
+    def record_withdrawals(self, location, withdrawals, date=None):
+        # withdrawals: iterable of (item, qty); zero/negative quantities are skipped
+        date = (date or datetime.now().date()).isoformat()
+        created_at = datetime.now().isoformat(timespec="seconds")
+        rows = [(location, item, date, float(qty), created_at) for item, qty in withdrawals if qty > 0]
+        if rows:
+            self._write([(
+                "INSERT INTO penarikan (location, item, date, qty, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )])
+        return len(rows)
+
+    def withdrawal_totals(self, location=None, start_date=None, end_date=None):
+        # {location: {item: qty}}, or {item: qty} when a location is given
+        sql = "SELECT location, item, SUM(qty) FROM penarikan WHERE 1=1"
+        params = []
+        if location is not None:
+            sql += " AND location = ?"
+            params.append(location)
+        if start_date is not None:
+            sql += " AND date >= ?"
+            params.append(start_date.isoformat())
+        if end_date is not None:
+            sql += " AND date <= ?"
+            params.append(end_date.isoformat())
+        sql += " GROUP BY location, item"
+        totals = {}
+        for loc, item, qty in self._query(sql, params):
+            totals.setdefault(loc, {})[item] = qty
+        if location is not None:
+            return totals.get(location, {})
+        return totals
+
+    def withdrawal_daily(self):
+        # [(location, item, date, qty)] summed per day, for the stock timeline
+        return self._query("SELECT location, item, date, SUM(qty) FROM penarikan GROUP BY location, item, date")
+
+    def withdrawal_ledger(self, location, item=None):
+        sql = "SELECT item, date, qty, created_at FROM penarikan WHERE location = ?"
+        params = [location]
+        if item is not None:
+            sql += " AND item = ?"
+            params.append(item)
+        return self._query(sql + " ORDER BY date, id", params)
+
+    # ---- portions ----
+    def load_porsi(self):
+        return {loc: {"small": small, "large": large}
+                for loc, small, large in self._query("SELECT location, small, large FROM porsi")}
+
+    def save_porsi(self, location, small, large):
+        self._write([(
+            "INSERT INTO porsi (location, small, large) VALUES (?, ?, ?) "
+            "ON CONFLICT (location) DO UPDATE SET small = excluded.small, large = excluded.large",
+            [(location, int(small), int(large))],
+        )])
+
+    def load_portion_plan(self):
+        # [(date, location, small, large)] ordered by date
+        return self._query("SELECT date, location, small, large FROM porsi_plan ORDER BY date, location")
+
+    def save_portion_plan(self, rows, replace=False):
+        # rows: iterable of (date, location, small, large); replace=True drops the old plan first
+        rows = [(d.isoformat(), loc, int(small), int(large)) for d, loc, small, large in rows]
+        statements = [("DELETE FROM porsi_plan", [()])] if replace else []
+        statements.append((
+            "INSERT INTO porsi_plan (date, location, small, large) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (date, location) DO UPDATE SET small = excluded.small, large = excluded.large",
+            rows,
+        ))
+        self._write(statements)
+        return len(rows)
+
+    # ---- gramasi config ----
+    def load_needs_config(self):
+        rows = self._query("SELECT item, small, large, unit FROM needs_config ORDER BY position")
+        return {item: {"small": small, "large": large, "unit": unit} for item, small, large, unit in rows}
+
+    def save_needs_config(self, needs_config):
+        # Replaces the whole config (reset to default); edits go through update_needs_config
+        rows = [(item, float(v.get("small", 0)), float(v.get("large", 0)), v.get("unit", "kg"), i)
+                for i, (item, v) in enumerate(needs_config.items())]
+        self._write([
+            ("DELETE FROM needs_config", [()]),
+            ("INSERT INTO needs_config (item, small, large, unit, position) VALUES (?, ?, ?, ?, ?)", rows),
+        ])
+
+    def update_needs_config(self, changed=None, removed=()):
+        # Writes only what one session changed, so edits of other sessions survive:
+        # changed {item: {"small", "large", "unit"}} is upserted (new items go last),
+        # removed items are deleted
+        rows = [(item, float(v.get("small", 0)), float(v.get("large", 0)), v.get("unit", "kg"))
+                for item, v in (changed or {}).items()]
+        self._write([
+            ("DELETE FROM needs_config WHERE item = ?", [(item,) for item in removed]),
+            ("INSERT INTO needs_config (item, small, large, unit, position) "
+             "VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM needs_config)) "
+             "ON CONFLICT (item) DO UPDATE SET small = excluded.small, large = excluded.large, unit = excluded.unit",
+             rows),
+        ])
+
+    # ---- item synonyms ----
+    def load_synonyms(self):
+        # {canonical gramasi item key: canonical stock item key}, confirmed by users
+        return dict(self._query("SELECT item_key, stock_key FROM item_synonyms"))
+
+    def save_synonyms(self, synonyms):
+        # synonyms: {item key: stock key or None}; None removes the mapping
+        self._write([
+            ("DELETE FROM item_synonyms WHERE item_key = ?", [(k,) for k, v in synonyms.items() if v is None]),
+            ("INSERT INTO item_synonyms (item_key, stock_key) VALUES (?, ?) "
+             "ON CONFLICT (item_key) DO UPDATE SET stock_key = excluded.stock_key",
+             [(k, v) for k, v in synonyms.items() if v is not None]),
+        ])
+
+    # ---- stock ----
+    def save_stock_snapshot(self, stock_by_location, start_date=None, end_date=None):
+        # stock_by_location: {location: {item: qty}} from the latest ingestion, covering the
+        # PDF dates start_date..end_date; only withdrawals in that range count against it
+        rows = [(loc, item, float(qty)) for loc, stock in stock_by_location.items() for item, qty in stock.items()]
+        statements = [
+            ("DELETE FROM stock_snapshot", [()]),
+            ("INSERT INTO stock_snapshot (location, item, qty) VALUES (?, ?, ?)", rows),
+            ("DELETE FROM stock_snapshot_range", [()]),
+        ]
+        if start_date is not None and end_date is not None:
+            statements.append(("INSERT INTO stock_snapshot_range (id, start_date, end_date) VALUES (1, ?, ?)",
+                               [(start_date.isoformat(), end_date.isoformat())]))
+        self._write(statements)
+
+    def stock_snapshot_range(self):
+        # (start_date, end_date) of the saved snapshot, (None, None) when unknown
+        rows = self._query("SELECT start_date, end_date FROM stock_snapshot_range")
+        if not rows:
+            return None, None
+        return tuple(datetime.strptime(d, "%Y-%m-%d").date() for d in rows[0])
+
+    def current_stock(self, location, start_date=None, end_date=None):
+        # Latest ingested stock minus what was withdrawn between start_date and end_date
+        # (inclusive, open when None), without touching df_all: {stock item name: qty}.
+        # Withdrawals count against the stock item with the same canonical key, or the one
+        # confirmed as its synonym.
+        params = [location]
+        dates = ""
+        if start_date is not None:
+            dates += " AND p.date >= ?"
+            params.append(start_date.isoformat())
+        if end_date is not None:
+            dates += " AND p.date <= ?"
+            params.append(end_date.isoformat())
+        rows = self._query(
+            "WITH withdrawn AS ("
+            " SELECT COALESCE(syn.stock_key, canonical_key(p.item)) AS key, SUM(p.qty) AS qty"
+            " FROM penarikan p LEFT JOIN item_synonyms syn ON syn.item_key = canonical_key(p.item)"
+            f" WHERE p.location = ?{dates} GROUP BY 1),"
+            " stock AS ("
+            " SELECT canonical_key(item) AS key, MIN(item) AS item, SUM(qty) AS qty"
+            " FROM stock_snapshot WHERE location = ? GROUP BY 1)"
+            " SELECT s.item, s.qty - COALESCE(w.qty, 0) FROM stock s LEFT JOIN withdrawn w ON w.key = s.key"
+            " ORDER BY s.item",
+            params + [location],
+        )
+        return dict(rows)
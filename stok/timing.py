@@ -0,0 +1,23 @@
+import time
+from contextlib import contextmanager
+
+# -------------------------
+# STAGE TIMING
+# -------------------------
+# timings is a plain {stage: seconds} dict; stages that run more than once accumulate.
+# Worker processes fill their own dict and the parent merges it with merge_timings.
+@contextmanager
+def stage(timings, name):
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+def merge_timings(timings, other):
+    for name, seconds in other.items():
+        timings[name] = timings.get(name, 0.0) + seconds
+    return timings
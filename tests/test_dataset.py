@@ -0,0 +1,74 @@
+"""The Parquet archive must give the same period recaps as the daily cube, with both engines."""
+import datetime as dt
+import importlib.util
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from stok.config import LOCATIONS  # noqa: E402
+from stok.dataset import dataset_dates, query_rekap, stock_rows, write_partitions  # noqa: E402
+from stok.ingest import compact_frame  # noqa: E402
+from stok.recap import build_daily_cube, cube_rekap_period  # noqa: E402
+
+DAYS = [dt.date(2025, 11, 24), dt.date(2025, 11, 25), dt.date(2025, 11, 27), dt.date(2025, 12, 1)]
+ITEMS = ["Bawang  Merah", "Beras", "Telur Ayam"]
+
+ENGINES = [
+    "pyarrow",
+    pytest.param("duckdb", marks=pytest.mark.skipif(importlib.util.find_spec("duckdb") is None,
+                                                     reason="duckdb not installed")),
+]
+
+@pytest.fixture(scope="module")
+def df_all():
+    rows = []
+    for d, day in enumerate(DAYS):
+        for i, item in enumerate(ITEMS):
+            # Every kitchen gets its own amounts, so a wrong Lokasi column shows up in the sums
+            quantities = {loc: (d + 1) * 1.25 + i + k * 10 for k, loc in enumerate(LOCATIONS)}
+            rows.append({"NAMA BARANG": item, "Tanggal": pd.Timestamp(day), **quantities,
+                         "Total": sum(quantities.values()), "Sumber File": f"{day}.pdf"})
+    return compact_frame(pd.DataFrame(rows))
+
+@pytest.fixture(scope="module")
+def archive(df_all, tmp_path_factory):
+    root = str(tmp_path_factory.mktemp("dataset"))
+    assert write_partitions(stock_rows(df_all), "stok", root) == len(DAYS) * len(LOCATIONS)
+    return root
+
+def _normalized(recap):
+    recap = recap.reset_index(drop=True)
+    recap["NAMA BARANG"] = recap["NAMA BARANG"].astype(str)
+    return recap
+
+def test_dataset_dates(archive):
+    assert dataset_dates("stok", archive) == DAYS
+    assert os.path.isdir(os.path.join(archive, "stok", "hari=2025-11-24", "dapur=batoh"))
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("start, end", [(DAYS[0], DAYS[-1]), (DAYS[1], DAYS[2]), (DAYS[3], DAYS[3]),
+                                        (dt.date(2025, 11, 26), dt.date(2025, 11, 30))])
+def test_query_rekap_matches_cube(df_all, archive, engine, start, end):
+    expected = cube_rekap_period(build_daily_cube(df_all), start, end)
+    actual = query_rekap("stok", start, end, archive, engine)
+    assert actual[LOCATIONS].to_numpy().any()
+    pd.testing.assert_frame_equal(_normalized(actual), _normalized(expected), check_dtype=False, rtol=0, atol=1e-9)
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_query_rekap_open_range_ignores_old_layout(df_all, archive, engine):
+    # Files of an older partition layout are not read
+    old = os.path.join(archive, "stok", "tanggal=2025-11-24", "lokasi=batoh")
+    os.makedirs(old, exist_ok=True)
+    stock_rows(df_all).to_parquet(os.path.join(old, "part-0.parquet"), index=False)
+    try:
+        expected = cube_rekap_period(build_daily_cube(df_all), DAYS[0], DAYS[-1])
+        actual = query_rekap("stok", None, None, archive, engine)
+        pd.testing.assert_frame_equal(_normalized(actual), _normalized(expected), check_dtype=False, rtol=0, atol=1e-9)
+    finally:
+        os.remove(os.path.join(old, "part-0.parquet"))
+
+def test_query_rekap_empty_range(archive):
+    assert query_rekap("stok", dt.date(2026, 1, 1), dt.date(2026, 1, 31), archive, "pyarrow").empty
@@ -0,0 +1,55 @@
+"""LAYOUT_TEMPLATES is shared by concurrent ingestions: updates and snapshots must not race."""
+import threading
+
+import pytest
+
+from stok import parsing
+from stok.cache import TableCache
+
+@pytest.fixture
+def templates():
+    saved = parsing.layout_templates_snapshot()
+    parsing.LAYOUT_TEMPLATES.clear()
+    yield parsing.LAYOUT_TEMPLATES
+    parsing.LAYOUT_TEMPLATES.clear()
+    parsing.merge_layout_templates(saved)
+
+def _template(n):
+    return {"x0": float(n), "x1": float(n) + 500, "n_cols": 26}
+
+def test_merge_keeps_the_bound_and_the_newest(templates):
+    parsing.merge_layout_templates({(842, 595, 0, None, f"gen {n}"): _template(n)
+                                    for n in range(parsing.MAX_LAYOUT_TEMPLATES + 10)})
+    assert len(templates) == parsing.MAX_LAYOUT_TEMPLATES
+    assert (842, 595, 0, None, f"gen {parsing.MAX_LAYOUT_TEMPLATES + 9}") in templates
+
+def test_concurrent_merges_and_saves(templates, tmp_path):
+    cache = TableCache(str(tmp_path))
+    errors = []
+    stop = threading.Event()
+
+    def merge(worker):
+        n = 0
+        while not stop.is_set():
+            parsing.merge_layout_templates({(842, 595, 0, None, f"worker {worker} gen {n}"): _template(n)})
+            n += 1
+
+    def save():
+        try:
+            for _ in range(200):
+                cache.save_templates(parsing.layout_templates_snapshot())
+        except Exception as e:
+            errors.append(e)
+
+    mergers = [threading.Thread(target=merge, args=(w,)) for w in range(3)]
+    for t in mergers:
+        t.start()
+    try:
+        save()
+    finally:
+        stop.set()
+        for t in mergers:
+            t.join()
+    assert not errors
+    assert len(templates) <= parsing.MAX_LAYOUT_TEMPLATES
+    assert 0 < len(cache.load_templates()) <= parsing.MAX_LAYOUT_TEMPLATES
@@ -0,0 +1,151 @@
+"""normalize_raw_table must match the original row-wise implementation.
+
+The reference below is the iterrows version normalize_raw_table replaced. Cells go through
+stok.parsing.extract_number, the per-cell form of the quantity parser, so only the
+vectorization is checked: once on a hand-made table with locale/unit cells the sample
+PDFs do not contain, then PDF by PDF on the sample ZIP.
+"""
+import io
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pdfplumber")
+
+from stok.config import LOCATIONS, TIDY_COLUMNS  # noqa: E402
+from stok.parsing import (  # noqa: E402
+    extract_number,
+    extract_tables_from_pdf_path,
+    normalize_raw_table,
+    parse_date_from_filename,
+)
+
+SAMPLE_ZIP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "24  NOV - 05 DES - 1_12_25.zip")
+
+# -------------------------
+# ROW-WISE REFERENCE
+# -------------------------
+def reference_normalize_raw_table(df_raw, source_filename):
+    if df_raw.empty:
+        return pd.DataFrame()
+
+    header_idx = None
+    for i, row in df_raw.iterrows():
+        joined = " ".join([str(x) for x in row.values if x is not None])
+        if "NAMA BARANG" in joined.upper():
+            header_idx = i
+            break
+    if header_idx is None:
+        header_idx = 0
+
+    df = df_raw.iloc[header_idx+1:].reset_index(drop=True).copy()
+    num_cols = df.shape[1]
+    colnames = []
+    for i in range(num_cols):
+        if i == 0:
+            colnames.append("NO")
+        elif i == 1:
+            colnames.append("NAMA BARANG")
+        else:
+            colnames.append(f"COL_{i}")
+    df.columns = colnames
+
+    dt = parse_date_from_filename(source_filename)
+    df["Tanggal"] = dt
+    df["Sumber File"] = source_filename
+
+    header_row_values = df_raw.iloc[header_idx] if header_idx < len(df_raw) else None
+    header_text = ""
+    if header_row_values is not None:
+        header_text = " ".join([str(x) for x in header_row_values if x is not None]).lower()
+
+    location_cols = {}
+    for loc in LOCATIONS:
+        if loc.lower() in header_text:
+            for j, val in enumerate(header_row_values):
+                if val and loc.lower() in str(val).lower():
+                    colname = colnames[j]
+                    location_cols[loc] = colname
+                    break
+
+    unmapped_locs = [l for l in LOCATIONS if l not in location_cols]
+    candidate_cols = [c for c in colnames if c.startswith("COL_")]
+    for idx, loc in enumerate(unmapped_locs):
+        if idx < len(candidate_cols):
+            location_cols[loc] = candidate_cols[idx]
+
+    tidy_rows = []
+    for _, row in df.iterrows():
+        item = str(row.get("NAMA BARANG", "")).strip()
+        if item == "" or item.lower() in ["", "nan", "no", "nama barang"]:
+            continue
+        entry = {
+            "NAMA BARANG": item,
+            "Tanggal": row["Tanggal"],
+            "Sumber File": row["Sumber File"]
+        }
+        total = 0
+        any_val = False
+        for loc, col in location_cols.items():
+            val = extract_number(row.get(col))
+            entry[loc] = val if val is not None else 0
+            if val:
+                any_val = True
+                try:
+                    total += float(val)
+                except:
+                    pass
+        entry["Total"] = total if any_val else None
+        tidy_rows.append(entry)
+
+    tidy_df = pd.DataFrame(tidy_rows)
+    for c in TIDY_COLUMNS:
+        if c not in tidy_df.columns:
+            tidy_df[c] = None
+    tidy_df = tidy_df[TIDY_COLUMNS]
+    return tidy_df
+
+# -------------------------
+# HAND-MADE TABLE
+# -------------------------
+def test_normalize_matches_row_wise_reference_on_locale_cells():
+    header = ["NO", "NAMA BARANG"] + LOCATIONS
+    cells = ["1.250,5", "2 x 5 kg", "500 gr", "1/2", "1 1/2", "½", "1.000", "2.5", "", None, "-", "3 btr"]
+    rows = [[str(i + 1), f"Barang {i}"] + [cells[(i + k) % len(cells)] for k in range(len(LOCATIONS))]
+            for i in range(len(cells))]
+    raw = pd.DataFrame([["LAPORAN STOK"] + [None] * (len(header) - 1), header] + rows)
+    name = "24  NOV - 05 DES - 1_12_25.pdf"
+    expected = reference_normalize_raw_table(raw, name)
+    actual = normalize_raw_table(raw, name)
+    pd.testing.assert_frame_equal(actual, expected)
+    # The locale parser is in effect, not the old first-number regex
+    first = actual.set_index("NAMA BARANG")[LOCATIONS[0]]
+    assert first["Barang 0"] == 1250.5
+    assert first["Barang 1"] == 10
+    assert first["Barang 2"] == 0.5
+
+# -------------------------
+# SAMPLE ZIP
+# -------------------------
+def sample_raw_tables():
+    with zipfile.ZipFile(SAMPLE_ZIP) as z:
+        names = sorted(n for n in z.namelist() if n.lower().endswith(".pdf"))
+        return [(os.path.basename(n), extract_tables_from_pdf_path(io.BytesIO(z.read(n)))) for n in names]
+
+@pytest.fixture(scope="module")
+def raw_tables():
+    if not os.path.exists(SAMPLE_ZIP):
+        pytest.skip("sample ZIP not available")
+    return sample_raw_tables()
+
+def test_sample_zip_has_pdfs(raw_tables):
+    assert raw_tables
+    assert all(not raw.empty for _, raw in raw_tables)
+
+def test_normalize_matches_row_wise_reference(raw_tables):
+    for name, raw in raw_tables:
+        expected = reference_normalize_raw_table(raw, name)
+        actual = normalize_raw_table(raw, name)
+        pd.testing.assert_frame_equal(actual, expected, obj=name)
@@ -0,0 +1,111 @@
+"""Portion plan import (ISO vs day-first dates, aliases, duplicates) and the shortage forecast."""
+import datetime as dt
+import io
+
+import pandas as pd
+import pytest
+
+from stok.config import LOCATIONS
+from stok.ingest import compact_frame
+from stok.items import ItemIndex
+from stok.plan import PLAN_COLUMNS, forecast_shortages, read_portion_plan
+from stok.recap import build_daily_cube
+
+# -------------------------
+# PLAN IMPORT
+# -------------------------
+# Header aliases (Tgl/Dapur/Kecil/Besar), ISO and day-first dates for the same day, kitchen
+# spellings from the PDFs, a date/location listed twice and an empty portion cell
+PLAN_CSV = """Tgl;Dapur;Kecil;Besar
+2025-12-05;Lam Lagang;10;20
+05/12/2025;PKN. BIL;1;2
+13/12/2025;batoh;3;4
+2025-12-13;Batoh;5;6
+2025-12-07;Seutui;;7
+"""
+
+EXPECTED_PLAN = pd.DataFrame([
+    (dt.date(2025, 12, 5), "Llagang", 10, 20),
+    (dt.date(2025, 12, 5), "Pkn Bil", 1, 2),
+    (dt.date(2025, 12, 7), "Seutui", 0, 7),
+    (dt.date(2025, 12, 13), "Batoh", 5, 6),
+], columns=PLAN_COLUMNS)
+
+def _excel(rows):
+    buf = io.BytesIO()
+    pd.DataFrame(rows, columns=["Tanggal", "Lokasi", "Porsi Kecil", "Porsi Besar"]).to_excel(buf, index=False)
+    return buf.getvalue()
+
+def test_read_csv_plan():
+    pd.testing.assert_frame_equal(read_portion_plan(PLAN_CSV.encode(), "plan.csv"), EXPECTED_PLAN)
+
+def test_read_excel_plan():
+    pytest.importorskip("openpyxl")
+    data = _excel([
+        (dt.datetime(2025, 12, 5), "Lam Lagang", 10, 20),  # date cell
+        ("05/12/2025", "PKN. BIL", 1, 2),
+        ("13/12/2025", "batoh", 3, 4),
+        ("2025-12-13", "Batoh", 5, 6),
+        ("2025-12-07", "Seutui", None, 7),
+    ])
+    pd.testing.assert_frame_equal(read_portion_plan(data, "plan.xlsx"), EXPECTED_PLAN)
+
+def test_iso_dates_are_not_read_day_first():
+    plan = read_portion_plan(b"Tanggal,Lokasi,Porsi Kecil,Porsi Besar\n2025-12-05,Batoh,1,1\n2025-01-02,Batoh,1,1\n",
+                             "plan.csv")
+    assert list(plan["Tanggal"]) == [dt.date(2025, 1, 2), dt.date(2025, 12, 5)]
+
+def test_unknown_location():
+    with pytest.raises(ValueError, match="Lokasi tidak dikenal di plan.csv: Banda"):
+        read_portion_plan(b"Tanggal,Lokasi,Porsi Kecil,Porsi Besar\n2025-12-05,Banda,1,1\n", "plan.csv")
+
+def test_invalid_date_names_the_row():
+    with pytest.raises(ValueError, match=r"baris 3"):
+        read_portion_plan(b"Tanggal,Lokasi,Porsi Kecil,Porsi Besar\n2025-12-05,Batoh,1,1\nbesok,Batoh,1,1\n",
+                          "plan.csv")
+
+def test_missing_column():
+    with pytest.raises(ValueError, match="Kolom 'Porsi Besar'"):
+        read_portion_plan(b"Tanggal,Lokasi,Porsi Kecil\n2025-12-05,Batoh,1\n", "plan.csv")
+
+# -------------------------
+# SHORTAGE FORECAST
+# -------------------------
+NEEDS = {
+    "Beras": {"small": 0.1, "large": 0.2, "unit": "kg"},
+    "Telur": {"small": 1, "large": 1, "unit": "butir"},
+}
+
+@pytest.fixture(scope="module")
+def cube():
+    # 10 kg rice and 500 eggs arrive at every kitchen on 1 Dec
+    rows = [{"NAMA BARANG": item, "Tanggal": pd.Timestamp(2025, 12, 1), **{loc: qty for loc in LOCATIONS},
+             "Total": qty * len(LOCATIONS), "Sumber File": "01_12_25.pdf"}
+            for item, qty in [("BERAS", 10.0), ("Telur", 500.0)]]
+    return build_daily_cube(compact_frame(pd.DataFrame(rows)))
+
+def _plan(rows):
+    return pd.DataFrame(rows, columns=PLAN_COLUMNS)
+
+# Batoh cooks 100 small portions (10 kg rice) a day from 1 to 3 Dec
+PLAN = _plan([(dt.date(2025, 12, d), "Batoh", 100, 0) for d in (1, 2, 3)])
+
+def test_forecast_first_shortage_date(cube):
+    result = forecast_shortages(cube, NEEDS, PLAN, [], ItemIndex(cube["items"]))
+    shortages = result["shortages"]
+    assert list(shortages[["Tanggal", "Lokasi", "Nama Barang", "Unit"]].itertuples(index=False, name=None)) == [
+        (dt.date(2025, 12, 2), "Batoh", "Beras", "kg"),
+    ]
+    assert shortages["Kekurangan"].iloc[0] == pytest.approx(10.0)
+    assert result["days"][0] == pd.Timestamp(2025, 12, 1).to_datetime64().astype("datetime64[D]")
+
+def test_forecast_counts_withdrawals(cube):
+    # 2 kg withdrawn on the first day brings the shortage forward to that day
+    withdrawals = [("Batoh", "Beras", "2025-12-01", 2.0)]
+    shortages = forecast_shortages(cube, NEEDS, PLAN, withdrawals, ItemIndex(cube["items"]))["shortages"]
+    assert list(shortages["Tanggal"]) == [dt.date(2025, 12, 1)]
+    assert shortages["Kekurangan"].iloc[0] == pytest.approx(2.0)
+
+def test_forecast_without_shortage(cube):
+    plan = _plan([(dt.date(2025, 12, 1), "Batoh", 50, 0)])
+    assert forecast_shortages(cube, NEEDS, plan, [], ItemIndex(cube["items"]))["shortages"].empty
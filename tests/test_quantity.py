@@ -0,0 +1,70 @@
+"""Locale-aware quantity parsing: per-cell parse_quantity and the bulk parse_quantities."""
+import math
+
+import numpy as np
+import pytest
+
+from stok.needs import UNIT_CONVERSIONS
+from stok.quantity import UNIT_ALIASES, parse_quantities, parse_quantity
+
+# -------------------------
+# SINGLE CELLS
+# -------------------------
+@pytest.mark.parametrize("text, amount, unit", [
+    # "." groups thousands, "," is the decimal mark
+    ("1.250,5", 1250.5, None),
+    ("1.000", 1000.0, None),
+    ("1.234.567", 1234567.0, None),
+    ("0,75", 0.75, None),
+    # exported spreadsheets: a lone "." not followed by three digits is a decimal point
+    ("2.5", 2.5, None),
+    ("1,250.5", 1250.5, None),
+    # products and units
+    ("2 x 5 kg", 10.0, "kg"),
+    ("2×3", 6.0, None),
+    ("2 * 3 ltr", 6.0, "liter"),
+    ("500 gr", 0.5, "kg"),
+    ("250 ml", 0.25, "liter"),
+    # fractions
+    ("1/2", 0.5, None),
+    ("1 1/2", 1.5, None),
+    ("½", 0.5, None),
+    ("1½", 1.5, None),
+    ("¾ kg", 0.75, "kg"),
+    # an unknown suffix keeps the amount as written
+    ("3 abc", 3.0, None),
+])
+def test_parse_quantity(text, amount, unit):
+    assert parse_quantity(text) == (pytest.approx(amount), unit)
+
+@pytest.mark.parametrize("text", ["1/0", "", "-", "abc"])
+def test_parse_quantity_without_amount(text):
+    amount, unit = parse_quantity(text)
+    assert math.isnan(amount)
+    assert unit is None
+
+@pytest.mark.parametrize("alias", sorted(UNIT_ALIASES))
+def test_every_unit_alias_converts_to_its_base_unit(alias):
+    base, factor = UNIT_CONVERSIONS[UNIT_ALIASES[alias]]
+    assert parse_quantity(f"4 {alias}") == (pytest.approx(4 * factor), base)
+    # suffixes are matched case-insensitively and may follow the number directly
+    assert parse_quantity(f"4{alias.upper()}") == (pytest.approx(4 * factor), base)
+
+# -------------------------
+# BULK
+# -------------------------
+CELLS = ["1.250,5", "2 x 5 kg", "500 gr", "1/2", "1 1/2", "½", "1/0", "", None, "-", "1.000", "3 btr",
+         "1.250,5", None, "500 gr"]
+
+def test_parse_quantities_matches_per_cell():
+    cells = np.array(CELLS, dtype=object).reshape(3, 5)
+    amounts, units = parse_quantities(cells)
+    assert amounts.shape == units.shape == cells.shape
+    for idx, cell in np.ndenumerate(cells):
+        expected = (np.nan, None) if cell is None else parse_quantity(str(cell))
+        np.testing.assert_equal(amounts[idx], expected[0])
+        assert units[idx] == expected[1]
+
+def test_parse_quantities_empty():
+    amounts, units = parse_quantities([])
+    assert amounts.shape == units.shape == (0,)
@@ -0,0 +1,53 @@
+"""Week buckets: labels across a gap week, and the cube against the groupby recaps."""
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+from stok.config import LOCATIONS, WEEK_MODES
+from stok.ingest import compact_frame
+from stok.recap import build_daily_cube, cube_rekap_week, cube_weeks, rekap_per_week
+
+# Wed 26 Nov - Mon 1 Dec 2025, then nothing until Wed 17 Dec: the weeks of 3 and 10 Dec
+# (relative) / 8 Dec (Monday calendar) have no data
+DAYS = [dt.date(2025, 11, 26), dt.date(2025, 11, 30), dt.date(2025, 12, 1), dt.date(2025, 12, 17), dt.date(2025, 12, 18)]
+ITEMS = ["Bawang Merah", "Beras", "Telur"]
+
+EXPECTED_LABELS = {
+    "relative": ["Minggu 1 (2025-11-26 - 2025-12-01)", "Minggu 4 (2025-12-17 - 2025-12-18)"],
+    "monday": ["Minggu 1 (2025-11-26 - 2025-11-30)", "Minggu 2 (2025-12-01 - 2025-12-01)",
+               "Minggu 4 (2025-12-17 - 2025-12-18)"],
+    "iso": ["Minggu 48/2025 (2025-11-26 - 2025-11-30)", "Minggu 49/2025 (2025-12-01 - 2025-12-01)",
+            "Minggu 51/2025 (2025-12-17 - 2025-12-18)"],
+}
+
+@pytest.fixture(scope="module")
+def df_all():
+    rows = []
+    for d, day in enumerate(DAYS):
+        for i, item in enumerate(ITEMS):
+            quantities = {loc: (d + 1) * (i + 1) * 0.5 + k for k, loc in enumerate(LOCATIONS)}
+            rows.append({"NAMA BARANG": item, "Tanggal": pd.Timestamp(day), **quantities,
+                         "Total": sum(quantities.values()), "Sumber File": f"{day}.pdf"})
+    return compact_frame(pd.DataFrame(rows))
+
+def _normalized(recap):
+    recap = recap.reset_index(drop=True)
+    recap["NAMA BARANG"] = recap["NAMA BARANG"].astype(str)
+    return recap
+
+def test_expected_labels_cover_every_mode():
+    assert set(EXPECTED_LABELS) == set(WEEK_MODES)
+
+@pytest.mark.parametrize("mode", list(WEEK_MODES))
+def test_week_labels_across_a_gap(df_all, mode):
+    assert list(rekap_per_week(df_all, mode)) == EXPECTED_LABELS[mode]
+    assert list(cube_weeks(build_daily_cube(df_all), mode)) == EXPECTED_LABELS[mode]
+
+@pytest.mark.parametrize("mode", list(WEEK_MODES))
+def test_cube_weeks_match_rekap_per_week(df_all, mode):
+    cube = build_daily_cube(df_all)
+    weeks = cube_weeks(cube, mode)
+    for label, recap in rekap_per_week(df_all, mode).items():
+        pd.testing.assert_frame_equal(_normalized(cube_rekap_week(cube, weeks[label])), _normalized(recap),
+                                      check_dtype=False, rtol=0, atol=1e-9, obj=label)